@@ -0,0 +1,127 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.utils.http import http_date
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+CONTENT = bytes(range(256)) * 4
+HASHED = 'posts/ab/{}.jpg'.format(hashlib.sha256(CONTENT).hexdigest())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaTestClass(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (HASHED, 'plain.txt'):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.url = settings.MEDIA_URL + HASHED
+
+    def test_full_file(self):
+        """Файл отдается целиком с заголовками кеширования; файлы с
+        хэшем в имени помечены immutable."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn(
+            'immutable',
+            self.client.get(settings.MEDIA_URL + 'plain.txt')['Cache-Control']
+        )
+
+    def test_conditional(self):
+        """Совпавший ETag или неизмененный файл дают 304."""
+        response = self.client.get(self.url)
+        cases = (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        )
+        for headers in cases:
+            with self.subTest(headers=headers):
+                response = self.client.get(self.url, **headers)
+
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range(self):
+        """Диапазон байт отдается с 206 и Content-Range, If-Range
+        с устаревшим валидатором возвращает весь файл."""
+        size = len(CONTENT)
+        cases = (
+            ('bytes=10-19', CONTENT[10:20], f'bytes 10-19/{size}'),
+            ('bytes=1000-', CONTENT[1000:], f'bytes 1000-{size - 1}/{size}'),
+            ('bytes=-5', CONTENT[-5:], f'bytes {size - 5}-{size - 1}/{size}'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+        for header in (f'bytes={size}-', f'bytes={size}-{size + 9}',
+                       'bytes=-0'):
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code,
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-10')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE=http_date(0),
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_sendfile(self):
+        """В режиме sendfile байты отдает веб-сервер."""
+        with self.settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + HASHED
+        )
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(TEMP_MEDIA_ROOT, HASHED)
+        )
+
+    def test_missing_and_outside(self):
+        """Отсутствующие файлы, каталоги и пути за MEDIA_ROOT - 404."""
+        for path in ('missing.jpg', 'posts/', '../settings.py'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
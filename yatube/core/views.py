@@ -1,4 +1,22 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+block_size = 64 * 1024
+immutable_max_age = 60 * 60 * 24 * 365
+# Имя из хэша содержимого: картинки постов и миниатюры sorl.
+hashed_name = re.compile(r'(^|/)[0-9a-f]{32,}\.\w+$')
+byte_range = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def page_not_found(request, exception):
@@ -15,3 +33,146 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+class _FileRange:
+    """Файл, из которого читается не больше length байт."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _requested_range(request, size, etag, last_modified):
+    """(начало, конец включительно) из заголовка Range, None - отдать
+    файл целиком, ValueError - диапазон за пределами файла.
+
+    Несколько диапазонов в одном запросе не поддерживаются, а
+    заголовок с началом после конца недействителен; в обоих случаях
+    файл отдается целиком, как требует RFC 7233.
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = byte_range.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and (
+        parse_http_date_safe(if_range) != last_modified
+    ):
+        return None
+    first, last = match.groups()
+    if first and last and int(first) > int(last):
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _media_headers(response, path, stat, etag):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if hashed_name.search(path):
+        patch_cache_control(
+            response, public=True, max_age=immutable_max_age, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_MAX_AGE
+        )
+    return response
+
+
+def _sendfile_response(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def _file_response(request, full_path, stat, content_type, etag,
+                   last_modified):
+    try:
+        requested = _requested_range(
+            request, stat.st_size, etag, last_modified
+        )
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    start, end = requested or (0, stat.st_size - 1)
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        file = open(full_path, 'rb')
+        file.seek(start)
+        if end < stat.st_size - 1:
+            file = _FileRange(file, length)
+        response = FileResponse(file, content_type=content_type)
+        response.block_size = block_size
+    if requested:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Content-Length'] = length
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдает файл из MEDIA_ROOT.
+
+    Поддерживает условные запросы по ETag и дате изменения и запросы
+    диапазона байт. Файлы с хэшем в имени кешируются навсегда. При
+    MEDIA_SENDFILE байты отдает веб-сервер по заголовку X-Sendfile
+    или X-Accel-Redirect, иначе файл передается FileResponse, который
+    WSGI-сервер может отправить через sendfile.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding or not content_type:
+        # Сжатый файл отдается как есть, без Content-Encoding.
+        content_type = 'application/octet-stream'
+    headers = _media_headers(HttpResponse(), path, stat, etag)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=headers
+    )
+    if conditional is not headers:
+        return conditional
+
+    if settings.MEDIA_SENDFILE:
+        response = _sendfile_response(path, full_path, content_type)
+    else:
+        response = _file_response(
+            request, full_path, stat, content_type, etag, last_modified
+        )
+    if response.status_code == 416:
+        return response
+    return _media_headers(response, path, stat, etag)
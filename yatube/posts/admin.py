@@ -1,9 +1,26 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
 
+from .bulk import delete_comments, delete_posts, move_posts
 from .models import Post, Group, Comment, Follow
+from .search import filter_posts
+from .utils import EstimatedPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedPaginator
+    show_full_result_count = False
+
+
+class MovePostsForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа'
+    )
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -11,13 +28,77 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('group',)
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    action_form = MovePostsForm
+    actions = ('move_to_group', 'delete_spam')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо LIKE '%...%' по всей таблице.
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = self.action_form.base_fields['group'].clean(
+                request.POST.get('group')
+            )
+        except ValidationError:
+            group = None
+        if group is None:
+            self.message_user(
+                request, 'Выберите группу для переноса.', messages.WARNING
+            )
+            return
+        moved = move_posts(queryset, group)
+        self.message_user(request, f'Перенесено в «{group}»: {moved}.')
+
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def delete_spam(self, request, queryset):
+        deleted = delete_posts(queryset)
+        self.message_user(request, f'Удалено постов: {deleted}.')
+
+    delete_spam.short_description = 'Удалить как спам'
+    delete_spam.allowed_permissions = ('delete',)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'post_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+    readonly_fields = ('post_count',)
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
+    date_hierarchy = 'created'
+    actions = ('delete_spam',)
+
+    def delete_spam(self, request, queryset):
+        deleted = delete_comments(queryset)
+        self.message_user(request, f'Удалено комментариев: {deleted}.')
+
+    delete_spam.short_description = 'Удалить как спам'
+    delete_spam.allowed_permissions = ('delete',)
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
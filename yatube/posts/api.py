@@ -0,0 +1,261 @@
+"""Чтение лент и постов в JSON для клиентов, которые не парсят HTML.
+
+Выборки те же, что у страниц posts.views. Списки листаются курсором,
+параметр fields оставляет в ответе только перечисленные поля. ETag
+считается по поколениям кэша лент до обращения к постам, поэтому
+неизменившаяся страница отдает 304 без выборки. Last-Modified -
+последний updated_at поста, группы или автора; у общей ленты и ленты
+подписок его нет: без индекса по updated_at он стоил бы прохода по
+всей таблице.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from . import feed_cache
+from .feeds import follow_feed, timeline_ordering
+from .models import Comment, Group, Post, User
+from .utils import (CursorPaginator, MergedCursorPaginator,
+                    comment_orderings, number)
+
+version = 'v1'
+max_limit = 100
+comment_ordering = comment_orderings['old']
+json_params = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def _image(post):
+    if not post.image:
+        return None
+    return {
+        'url': post.image.url,
+        'width': post.image_width,
+        'height': post.image_height,
+        'color': post.image_color or None,
+    }
+
+
+post_fields = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'comment_count': lambda post: post.comment_count,
+    'image': _image,
+}
+
+comment_fields = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'parent': lambda comment: comment.parent_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=json_params
+    )
+
+
+def api_view(view):
+    """Только GET и HEAD; ошибки отдаются JSON, а не HTML-страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return _error(str(error), error.status)
+        except Http404:
+            return _error('Не найдено', 404)
+    return wrapper
+
+
+def _fields(request, known):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(known)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', number))
+    except ValueError:
+        raise ApiError('limit должен быть целым числом')
+    return min(max(limit, 1), max_limit)
+
+
+def _etag(request, payload):
+    digest = hashlib.md5(
+        '|'.join((version, request.get_full_path(), payload)).encode()
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def _not_modified(request, etag, last_modified=None):
+    """Ответ 304, если у клиента актуальные ETag или дата изменения,
+    иначе None."""
+    headers = _headers(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified),
+        response=headers,
+    )
+    return None if response is headers else response
+
+
+def _headers(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _json(content, etag, last_modified=None):
+    return _headers(
+        HttpResponse(content, content_type='application/json'),
+        etag, last_modified,
+    )
+
+
+def _versioned(request, scopes, build, last_modified=None):
+    """ETag по поколениям кэша лент scopes и дате изменения: при
+    совпадении 304 без вызова build, иначе JSON из build()."""
+    etag = _etag(
+        request, f'{feed_cache.version(*scopes)}|{last_modified}'
+    )
+    response = _not_modified(request, etag, last_modified)
+    if response is None:
+        response = _json(
+            json.dumps(build(), **json_params), etag, last_modified
+        )
+    return response
+
+
+def _hashed(request, data):
+    """ETag по телу ответа: экономит трафик, но не запросы к базе."""
+    content = json.dumps(data, **json_params)
+    etag = _etag(request, content)
+    return _not_modified(request, etag) or _json(content, etag)
+
+
+def _latest(posts):
+    return posts.order_by('-updated_at').values_list(
+        'updated_at', flat=True
+    ).first()
+
+
+def _serialize(objects, fields, known):
+    return [{name: known[name](obj) for name in fields} for obj in objects]
+
+
+def _page(request, paginator, known):
+    fields = _fields(request, known)
+    page = paginator.page(request.GET.get('cursor'))
+    return {
+        'results': _serialize(page.object_list, fields, known),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _post_version(post_id):
+    """Поколения страницы поста и его updated_at: правка поста и
+    комментарии сдвигают его."""
+    author_id, group_id, updated_at = get_object_or_404(
+        Post.objects.values_list('author_id', 'group_id', 'updated_at'),
+        pk=post_id,
+    )
+    return feed_cache.detail_scopes(author_id, group_id), updated_at
+
+
+@api_view
+def index(request):
+    paginator = CursorPaginator(Post.objects.for_feed(), _limit(request))
+    return _versioned(
+        request, ('index', 'authors'),
+        lambda: _page(request, paginator, post_fields),
+    )
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    paginator = CursorPaginator(
+        Post.objects.filter(group=group).for_feed(), _limit(request)
+    )
+    return _versioned(
+        request, (f'group:{group.pk}', 'authors'),
+        lambda: _page(request, paginator, post_fields),
+        _latest(Post.objects.filter(group=group)),
+    )
+
+
+@api_view
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    paginator = CursorPaginator(author.post.for_feed(), _limit(request))
+    return _versioned(
+        request, (f'profile:{author.pk}', 'authors'),
+        lambda: _page(request, paginator, post_fields),
+        _latest(author.post.all()),
+    )
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', status=401)
+    paginator = MergedCursorPaginator(
+        follow_feed(request.user), _limit(request), timeline_ordering
+    )
+    # Подписки не сдвигают поколений лент, поэтому ETag по телу.
+    return _hashed(request, _page(request, paginator, post_fields))
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = _fields(request, post_fields)
+    scopes, updated_at = _post_version(post_id)
+    return _versioned(request, scopes, lambda: _serialize(
+        [get_object_or_404(Post.objects.for_feed(), pk=post_id)],
+        fields, post_fields,
+    )[0], updated_at)
+
+
+@api_view
+def post_comments(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('id', 'post', 'parent', 'text', 'created', 'author__username')
+    paginator = CursorPaginator(comments, _limit(request), comment_ordering)
+    scopes, updated_at = _post_version(post_id)
+    return _versioned(
+        request, scopes,
+        lambda: _page(request, paginator, comment_fields), updated_at,
+    )
@@ -0,0 +1,136 @@
+import posixpath
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnails
+from .models import MediaBlob, Post
+
+batch_size = 1000
+grace_period = timedelta(days=2)
+
+
+def _walk(storage, top):
+    """Имена всех файлов под каталогом top хранилища."""
+    if not storage.exists(top):
+        return
+    directories, files = storage.listdir(top)
+    for name in files:
+        yield posixpath.join(top, name)
+    for directory in directories:
+        yield from _walk(storage, posixpath.join(top, directory))
+
+
+def _chunks(names, batch):
+    names = iter(names)
+    while True:
+        chunk = list(islice(names, batch))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _old(storage, name, cutoff):
+    try:
+        return storage.get_modified_time(name) < cutoff
+    except OSError:
+        return False
+
+
+def _remove(storage, name):
+    thumbnails.forget(name)
+    storage.delete(name)
+
+
+def release_blobs(cutoff, batch, dry_run):
+    """Удаляет файлы, на которые давно не ссылается ни один пост."""
+    storage = Post._meta.get_field('image').storage
+    released = MediaBlob.objects.filter(ref_count=0, changed__lt=cutoff)
+    removed = 0
+    last_name = ''
+    while True:
+        names = list(
+            released.filter(name__gt=last_name).order_by('name')
+            .values_list('name', flat=True)[:batch]
+        )
+        if not names:
+            return removed
+        last_name = names[-1]
+        # Счетчик мог разойтись с постами; такие файлы не трогаем.
+        names = set(names) - set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        # Файл, который только что загрузили заново, еще получит ссылку.
+        names = {
+            name for name in names
+            if not storage.exists(name) or _old(storage, name, cutoff)
+        }
+        if not dry_run:
+            released.filter(name__in=names).delete()
+            names -= set(
+                MediaBlob.objects.filter(name__in=names).values_list(
+                    'name', flat=True
+                )
+            )
+            for name in names:
+                _remove(storage, name)
+        removed += len(names)
+
+
+def remove_untracked(cutoff, batch, dry_run):
+    """Удаляет файлы картинок без записи MediaBlob: брошенные загрузки
+    и остатки прерванной записи."""
+    field = Post._meta.get_field('image')
+    removed = 0
+    for names in _chunks(_walk(field.storage, field.upload_to), batch):
+        known = set(
+            MediaBlob.objects.filter(name__in=names).values_list(
+                'name', flat=True
+            )
+        )
+        for name in names:
+            if name in known or not _old(field.storage, name, cutoff):
+                continue
+            if not dry_run:
+                _remove(field.storage, name)
+            removed += 1
+    return removed
+
+
+def remove_orphan_thumbnails(cutoff, batch, dry_run):
+    """Удаляет файлы миниатюр, о которых не знает kvstore sorl."""
+    storage = default.storage
+    removed = 0
+    top = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+    for names in _chunks(_walk(storage, top), batch):
+        found = thumbnails.lookup_many(
+            [ImageFile(name, storage) for name in names]
+        )
+        for name, thumbnail in zip(names, found):
+            if thumbnail is not None or not _old(storage, name, cutoff):
+                continue
+            if not dry_run:
+                storage.delete(name)
+            removed += 1
+    return removed
+
+
+def collect_garbage(batch=batch_size, grace=grace_period, dry_run=False):
+    """Удаляет неиспользуемые файлы картинок и миниатюр пачками.
+
+    Файлы моложе grace не трогаются: на них может ссылаться пост,
+    который еще сохраняется, или миниатюра, еще не записанная
+    в kvstore. Возвращает число удаленных файлов по видам.
+    """
+    cutoff = timezone.now() - grace
+    return {
+        'blobs': release_blobs(cutoff, batch, dry_run),
+        'untracked': remove_untracked(cutoff, batch, dry_run),
+        'thumbnails': remove_orphan_thumbnails(cutoff, batch, dry_run),
+    }
@@ -0,0 +1,87 @@
+"""Массовые операции над постами и комментариями для админки.
+
+Обычные save() и delete() на каждый объект шлют сигналы и сдвигают
+счетчики по одному. Здесь выборка меняется несколькими запросами
+на всю пачку. Перенос пересчитывает счетчики групп одним UPDATE
+с подзапросом, а удаление выполняет те же функции, что post_delete,
+сразу для всей пачки.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import feed_cache, object_cache
+from .counters import _count_of
+from .models import Comment, Group, Post, Timeline
+from .signals import comments_deleted, posts_deleted
+
+
+def _distinct(queryset, field):
+    return set(
+        queryset.order_by().values_list(field, flat=True).distinct()
+    )
+
+
+def _recount_groups(group_ids):
+    Group.objects.filter(pk__in=group_ids).update(
+        post_count=_count_of(Post, 'group')
+    )
+    object_cache.forget(Group, *group_ids)
+
+
+def _scopes(authors, groups):
+    return [
+        'index',
+        *(f'profile:{author_id}' for author_id in authors),
+        *(f'group:{group_id}' for group_id in groups),
+    ]
+
+
+def move_posts(queryset, group):
+    """Переносит посты в группу одним UPDATE; возвращает их число."""
+    posts = queryset.exclude(group=group)
+    pks = _distinct(posts, 'pk')
+    authors = _distinct(posts, 'author_id')
+    groups = _distinct(posts, 'group_id') - {None}
+    with transaction.atomic():
+        moved = Post.objects.filter(pk__in=pks).update(
+            group=group, updated_at=timezone.now()
+        )
+        _recount_groups(groups | {group.pk})
+    object_cache.forget(Post, *pks)
+    feed_cache.bump(*_scopes(authors, groups | {group.pk}))
+    return moved
+
+
+def delete_posts(queryset):
+    """Удаляет посты вместе с комментариями и записями лент без
+    сигналов на каждый объект; возвращает число удаленных постов.
+
+    Последствия удаления те же, что у post_delete: их выполняет
+    общая signals.posts_deleted.
+    """
+    posts = Post.objects.filter(pk__in=queryset.values('pk'))
+    rows = list(posts.values_list('pk', 'author_id', 'group_id', 'image'))
+    with transaction.atomic():
+        Timeline.objects.filter(post__in=posts)._raw_delete(posts.db)
+        Comment.objects.filter(post__in=posts)._raw_delete(posts.db)
+        deleted = posts._raw_delete(posts.db)
+        posts_deleted(rows)
+    return deleted
+
+
+def delete_comments(queryset):
+    """Удаляет комментарии вместе с ветками ответов одним DELETE;
+    счетчики постов и оставшихся предков сдвигает общая с post_delete
+    signals.comments_deleted."""
+    selected = Comment.objects.filter(pk__in=queryset.values('pk'))
+    branches = Q()
+    for depth in range(Comment.max_depth + 1):
+        lookup = '__'.join(['parent'] * depth) or 'pk'
+        branches |= Q(**{f'{lookup}__in': selected.values('pk')})
+    comments = Comment.objects.filter(branches)
+    rows = list(comments.values_list('post_id', 'path'))
+    with transaction.atomic():
+        deleted = comments._raw_delete(comments.db)
+        comments_deleted(rows)
+    return deleted
@@ -0,0 +1,106 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import feed_cache
+from .models import AuthorStats, Follow, Group, Post, User
+
+
+def conditional_page(validator):
+    """Отвечает 304 до запуска view, если страница не менялась.
+
+    validator(request, *args, **kwargs) одним запросом возвращает
+    (время последнего изменения, части ETag) или None, если объекта
+    нет: тогда view сама решает, что ответить. В ETag также входят
+    адрес с параметрами и пользователь, который смотрит страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            validated = validator(request, *args, **kwargs)
+            if validated is None:
+                return view(request, *args, **kwargs)
+            last_modified, parts = validated
+            etag = quote_etag(hashlib.md5(repr((
+                request.get_full_path(), request.user.pk, *parts
+            )).encode()).hexdigest())
+            timestamp = (
+                int(last_modified.timestamp()) if last_modified else None
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(posts):
+    return Subquery(
+        posts.order_by('-updated_at').values('updated_at')[:1]
+    )
+
+
+def _author_posts(author):
+    return Subquery(
+        AuthorStats.objects.filter(author=author).values('post_count')[:1]
+    )
+
+
+def post_validator(request, post_id, **kwargs):
+    """Правка поста и его комментарии сдвигают updated_at, а число
+    постов автора выводится рядом с постом."""
+    row = Post.objects.filter(pk=post_id).annotate(
+        author_posts=_author_posts(OuterRef('author'))
+    ).values_list(
+        'updated_at', 'author_id', 'group_id', 'author_posts'
+    ).first()
+    if row is None:
+        return None
+    updated_at, author_id, group_id, author_posts = row
+    return updated_at, (
+        author_posts,
+        feed_cache.version(*feed_cache.detail_scopes(author_id, group_id)),
+    )
+
+
+def profile_validator(request, username):
+    """Последнее изменение постов автора, их число и подписка
+    смотрящего на автора."""
+    row = User.objects.filter(username=username).annotate(
+        latest=_latest(Post.objects.filter(author=OuterRef('pk'))),
+        author_posts=_author_posts(OuterRef('pk')),
+        is_followed=Exists(Follow.objects.filter(
+            user_id=request.user.pk, author=OuterRef('pk')
+        )),
+    ).values_list('pk', 'latest', 'author_posts', 'is_followed').first()
+    if row is None:
+        return None
+    author_id, latest, author_posts, following = row
+    return latest, (
+        author_posts, following,
+        feed_cache.version(f'profile:{author_id}', 'authors'),
+    )
+
+
+def group_validator(request, slug):
+    """Последнее изменение постов группы и их число."""
+    row = Group.objects.filter(slug=slug).annotate(
+        latest=_latest(Post.objects.filter(group=OuterRef('pk'))),
+    ).values_list('pk', 'latest', 'post_count').first()
+    if row is None:
+        return None
+    group_id, latest, post_count = row
+    return latest, (
+        post_count, feed_cache.version(f'group:{group_id}', 'authors'),
+    )
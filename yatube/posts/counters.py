@@ -0,0 +1,199 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce, Concat, Greatest
+from django.utils import timezone
+
+from . import object_cache
+from .models import AuthorStats, Comment, Group, MediaBlob, Post
+
+batch_size = 10000
+
+
+def _shifted(field, delta):
+    # Счетчик мог разойтись с таблицей после массовой записи в обход
+    # сигналов: вычитание не опускает его ниже нуля, иначе UPDATE
+    # упадет на CHECK положительного поля.
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def _shift(queryset, field, delta):
+    return queryset.update(**{field: _shifted(field, delta)})
+
+
+def shift_author_posts(author_id, delta):
+    with transaction.atomic():
+        updated = _shift(
+            AuthorStats.objects.filter(author_id=author_id),
+            'post_count', delta
+        )
+        if updated or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                AuthorStats.objects.create(
+                    author_id=author_id, post_count=delta
+                )
+        except IntegrityError:
+            # Строку успел создать параллельный запрос.
+            _shift(
+                AuthorStats.objects.filter(author_id=author_id),
+                'post_count', delta
+            )
+
+
+def shift_group_posts(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'post_count', delta)
+        object_cache.forget(Group, group_id)
+
+
+def shift_post_comments(post_id, delta):
+    # Комментарии меняют страницу поста, поэтому сдвигают и updated_at.
+    Post.objects.filter(pk=post_id).update(
+        comment_count=_shifted('comment_count', delta),
+        updated_at=timezone.now(),
+    )
+    object_cache.forget(Post, post_id)
+
+
+def shift_replies(path, delta):
+    """Меняет число ответов у всех комментариев пути ветки."""
+    if path:
+        _shift(
+            Comment.objects.filter(pk__in=map(int, path.split('.'))),
+            'reply_count', delta
+        )
+
+
+def release_replies(counts):
+    """Снимает ответы у предков по {id: сколько ответов удалено},
+    одним UPDATE на каждое значение сдвига."""
+    by_delta = defaultdict(list)
+    for pk, count in counts.items():
+        by_delta[count].append(pk)
+    for count, pks in by_delta.items():
+        _shift(Comment.objects.filter(pk__in=pks), 'reply_count', -count)
+
+
+def shift_blob_refs(name, delta):
+    """Меняет число постов, ссылающихся на файл картинки. Время
+    изменения нужно сборщику мусора, чтобы не удалить файл сразу
+    после того, как на него перестали ссылаться."""
+    if not name:
+        return
+    blobs = MediaBlob.objects.filter(name=name)
+    with transaction.atomic():
+        updated = blobs.update(
+            ref_count=_shifted('ref_count', delta), changed=timezone.now()
+        )
+        if updated or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, ref_count=delta)
+        except IntegrityError:
+            blobs.update(
+                ref_count=F('ref_count') + delta, changed=timezone.now()
+            )
+
+
+def author_post_count(author):
+    return AuthorStats.objects.filter(author=author).values_list(
+        'post_count', flat=True
+    ).first() or 0
+
+
+def _count_of(model, field, outer='pk'):
+    """Подзапрос COUNT(*) по внешнему ключу field, 0 если строк нет."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def replies_in_branch():
+    """Подзапрос числа комментариев ниже данного по пути ветки."""
+    return Coalesce(
+        Subquery(
+            Comment.objects.filter(
+                post=OuterRef('post'),
+                path__gt=OuterRef('path'),
+                path__lt=Concat(OuterRef('path'), Value('/')),
+            )
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _in_batches(queryset, batch, **update):
+    """UPDATE по диапазонам первичного ключа, чтобы не держать
+    блокировку на всю таблицу."""
+    remaining = queryset
+    updated = 0
+    while True:
+        pks = list(
+            remaining.order_by('pk').values_list('pk', flat=True)[:batch]
+        )
+        if not pks:
+            return updated
+        updated += remaining.filter(pk__lte=pks[-1]).update(**update)
+        object_cache.forget(queryset.model, *pks)
+        remaining = queryset.filter(pk__gt=pks[-1])
+
+
+def reconcile_counters(batch=batch_size):
+    """Пересчитывает все счетчики по таблицам и возвращает число
+    обновленных строк по каждой модели."""
+    authors = Post.objects.order_by().values_list(
+        'author_id', flat=True
+    ).distinct()
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(author_id=author_id) for author_id in authors.iterator()),
+        batch_size=batch,
+        ignore_conflicts=True,
+    )
+    images = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=name) for name in images.iterator()),
+        batch_size=batch,
+        ignore_conflicts=True,
+    )
+    return {
+        'authors': _in_batches(
+            AuthorStats.objects.all(), batch,
+            post_count=_count_of(Post, 'author', 'author_id')
+        ),
+        'groups': _in_batches(
+            Group.objects.all(), batch, post_count=_count_of(Post, 'group')
+        ),
+        'posts': _in_batches(
+            Post.objects.all(), batch,
+            comment_count=_count_of(Comment, 'post')
+        ),
+        'replies': _in_batches(
+            Comment.objects.all(), batch, reply_count=replies_in_branch()
+        ),
+        'blobs': _in_batches(
+            MediaBlob.objects.all(), batch,
+            ref_count=_count_of(Post, 'image', 'name')
+        ),
+    }
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(scope):
+    return f'feeds:generation:{scope}'
+
+
+def _initial():
+    # Счетчик, потерянный кэшем, не должен начаться с уже
+    # использованного значения.
+    return int(time.time() * 1000)
+
+
+def version(*scopes):
+    """Строка поколений для ключа фрагмента ленты."""
+    keys = [_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколение: закэшированные фрагменты перестают читаться."""
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), None)
+
+
+def post_scopes(author_id, *group_ids):
+    scopes = ['index', f'profile:{author_id}']
+    scopes.extend(
+        f'group:{group_id}' for group_id in set(group_ids) if group_id
+    )
+    return scopes
+
+
+def detail_scopes(author_id, group_id):
+    """Поколения, от которых зависит страница одного поста: без общей
+    ленты, которую сдвигает любой пост на сайте."""
+    return [*post_scopes(author_id, group_id)[1:], 'authors']
+
+
+def context(scope):
+    """Таймаут и версия фрагмента ленты для тега {% cache %}."""
+    return {
+        'timeout': settings.FEED_CACHE_TIMEOUT,
+        'version': version(scope, 'authors'),
+    }
@@ -0,0 +1,282 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import AuthorStats, Follow, Post, Timeline
+
+batch_size = 1000
+timeline_ordering = ('-feed_date', '-feed_post')
+followers_cache_timeout = 300
+
+logger = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _followers_key(author_id):
+    return f'feeds:followers:{author_id}'
+
+
+def _bulk_insert(entries, size=batch_size):
+    batch = []
+    inserted = 0
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        inserted += len(batch)
+    return inserted
+
+
+def follower_counts(author_ids):
+    """Число подписчиков по авторам, с кэшем на followers_cache_timeout."""
+    keys = {author_id: _followers_key(author_id) for author_id in author_ids}
+    cached = cache.get_many(keys.values())
+    counts = {
+        author_id: cached[key]
+        for author_id, key in keys.items() if key in cached
+    }
+    missing = [author_id for author_id in keys if author_id not in counts]
+    if missing:
+        fresh = dict(
+            Follow.objects.filter(author_id__in=missing)
+            .values_list('author_id')
+            .annotate(Count('id'))
+        )
+        fresh = {author_id: fresh.get(author_id, 0) for author_id in missing}
+        cache.set_many(
+            {keys[author_id]: n for author_id, n in fresh.items()},
+            followers_cache_timeout
+        )
+        counts.update(fresh)
+    return counts
+
+
+def pulled_authors(author_ids):
+    """Авторы, чьи посты читаются напрямую, а не из материализованной
+    ленты.
+
+    Выше FEED_PULL_THRESHOLD подписчиков автор читается напрямую, не
+    выше FEED_PUSH_THRESHOLD - раскладывается по лентам. Между порогами
+    решает отметка AuthorStats.pulled: автор остается в прежнем режиме
+    и не переключается на каждой подписке и отписке.
+    """
+    counts = follower_counts(author_ids)
+    pulled = {
+        author_id for author_id, n in counts.items()
+        if n > settings.FEED_PULL_THRESHOLD
+    }
+    between = [
+        author_id for author_id, n in counts.items()
+        if settings.FEED_PUSH_THRESHOLD < n <= settings.FEED_PULL_THRESHOLD
+    ]
+    if between:
+        pulled.update(
+            AuthorStats.objects.filter(
+                author_id__in=between, pulled=True
+            ).values_list('author_id', flat=True)
+        )
+    return pulled
+
+
+def mark_pulled(author_id):
+    """Отмечает автора, перешедшего FEED_PULL_THRESHOLD."""
+    if not AuthorStats.objects.filter(author_id=author_id).update(
+        pulled=True
+    ):
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(author_id=author_id, pulled=True)],
+            ignore_conflicts=True,
+        )
+
+
+def forget_followers(author_id):
+    cache.delete(_followers_key(author_id))
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if pulled_authors([post.author_id]):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _bulk_insert(
+        Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    forget_followers(author_id)
+    if follower_counts([author_id])[author_id] > (
+        settings.FEED_PULL_THRESHOLD
+    ):
+        mark_pulled(author_id)
+        return
+    if pulled_authors([author_id]):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _bulk_insert(
+        Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator(chunk_size=batch_size)
+    )
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки.
+
+    Если автор, читавшийся напрямую, опустился до FEED_PUSH_THRESHOLD,
+    отметка снимается, а его посты раскладываются по лентам оставшихся
+    подписчиков после коммита. Сравнивается итоговое число подписчиков,
+    поэтому массовая отписка, перескочившая порог, тоже его переходит,
+    а снятие отметки одним UPDATE ставит раскладку один раз.
+    """
+    forget_followers(author_id)
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    if follower_counts([author_id])[author_id] > (
+        settings.FEED_PUSH_THRESHOLD
+    ):
+        return
+    if AuthorStats.objects.filter(author_id=author_id, pulled=True).update(
+        pulled=False
+    ):
+        transaction.on_commit(lambda: schedule_push(author_id))
+
+
+def push_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    Записи, оставшиеся с тех пор, когда автор был ниже порога,
+    пропускаются. Подписчиков не больше FEED_PUSH_THRESHOLD, поэтому
+    их список держится в памяти, а посты читаются одним проходом.
+    """
+    followers = list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    return _bulk_insert(
+        Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator(chunk_size=batch_size)
+        for user_id in followers
+    )
+
+
+def _push_in_thread(author_id):
+    try:
+        push_author(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        # У потока пула свое соединение, оно не закроется само.
+        connection.close()
+
+
+def schedule_push(author_id):
+    """Ставит push_author в фон. При FEED_PUSH_WORKERS = 0
+    раскладывает сразу в текущем запросе."""
+    global _executor
+    if not settings.FEED_PUSH_WORKERS:
+        push_author(author_id)
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_PUSH_WORKERS
+            )
+    _executor.submit(_push_in_thread, author_id)
+
+
+def rebuild_timelines(batch=batch_size):
+    """Пересобирает все ленты заново, обрабатывая подписки пачками.
+
+    Посты авторов выше FEED_PULL_THRESHOLD не раскладываются, отметки
+    AuthorStats.pulled ставятся заново по числу подписчиков.
+    Возвращает количество созданных записей.
+    """
+    Timeline.objects.all().delete()
+    AuthorStats.objects.filter(pulled=True).update(pulled=False)
+    popular = Follow.objects.order_by().values('author_id').annotate(
+        followers=Count('id')
+    ).filter(followers__gt=settings.FEED_PULL_THRESHOLD)
+    for author_id in popular.values_list('author_id', flat=True):
+        mark_pulled(author_id)
+    created = 0
+    follows = Follow.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'author_id'
+    )
+    last_pk = 0
+    while True:
+        chunk = list(follows.filter(pk__gt=last_pk)[:batch])
+        if not chunk:
+            return created
+        last_pk = chunk[-1][0]
+        followers = defaultdict(set)
+        for _, user_id, author_id in chunk:
+            followers[author_id].add(user_id)
+        for author_id in pulled_authors(list(followers)):
+            del followers[author_id]
+        posts = Post.objects.filter(author_id__in=followers).values_list(
+            'pk', 'author_id', 'pub_date'
+        )
+        entries = (
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, author_id, pub_date in posts.iterator(
+                chunk_size=batch
+            )
+            for user_id in followers[author_id]
+        )
+        created += _bulk_insert(entries, batch)
+
+
+def follow_posts(user):
+    """Лента подписок прямым соединением Follow и Post."""
+    posts = Post.objects.filter(author__following__user=user)
+    return posts.for_feed().annotate(
+        feed_date=F('pub_date'),
+        feed_post=F('id'),
+    )
+
+
+def follow_feed(user):
+    """Источники ленты подписок для k-way слияния.
+
+    Первый источник - материализованная лента (проход по индексу
+    timeline), дальше по запросу на каждого автора выше порога.
+    """
+    sources = [
+        Post.objects.filter(timeline__user=user).for_feed().annotate(
+            feed_date=F('timeline__pub_date'),
+            feed_post=F('timeline__post'),
+        )
+    ]
+    authors = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    for author_id in sorted(pulled_authors(list(authors))):
+        sources.append(
+            Post.objects.filter(author_id=author_id).for_feed().annotate(
+                feed_date=F('pub_date'),
+                feed_post=F('id'),
+            )
+        )
+    return sources
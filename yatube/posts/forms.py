@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Post, Comment
+from .thumbnails import sanitize
+from .uploads import check_image, check_size_first
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +12,17 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        check_size_first(self.fields['image'])
+        self.fields['image'].validators.append(check_image)
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            image = sanitize(image) or image
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRUKVStore(KVStore):
+    """Хранилище sorl с ограниченным LRU процесса перед кэшем и базой.
+
+    В LRU попадают только найденные значения. Имя картинки - хэш ее
+    содержимого, а имена миниатюр выводятся из него, поэтому запись
+    в чужом процессе не может указать на чужую миниатюру: после сборки
+    мусора и повторной загрузки файлы создаются под теми же именами.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > settings.POST_THUMBNAIL_LRU_SIZE:
+                self._local.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+            return value
+
+    def _forget(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self._forget(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        with self._lock:
+            self._local.clear()
+
+    def get_many(self, image_files):
+        """Пакетный get: LRU, затем один get_many кэша, затем один
+        запрос к базе. Возвращает список в порядке image_files,
+        None на месте отсутствующих."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        found = {}
+        for key in keys:
+            value = self._recall(key)
+            if value is not None:
+                found[key] = value
+        missing = [key for key in set(keys) if key not in found]
+        if missing:
+            cached = self.cache.get_many(missing)
+            found.update(cached)
+            missing = [key for key in missing if key not in cached]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            self.cache.set_many(
+                {key: stored.get(key, EMPTY_VALUE) for key in missing},
+                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            found.update(stored)
+        resolved = []
+        for key in keys:
+            value = found.get(key, EMPTY_VALUE)
+            if value == EMPTY_VALUE:
+                resolved.append(None)
+                continue
+            self._remember(key, value)
+            resolved.append(deserialize_image_file(value))
+        return resolved
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import describe_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, размытое превью и основной цвет картинок '
+        'у постов, где их еще нет. Картинки читаются пулом процессов, '
+        'посты обновляются пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 - читать картинки в этом процессе.'
+        )
+
+    def handle(self, *args, **options):
+        batch = options['batch_size']
+        posts = Post.objects.filter(image_width__isnull=True).exclude(
+            image=''
+        ).order_by('pk')
+        filled = failed = 0
+        last_pk = 0
+        pool = (
+            ProcessPoolExecutor(options['workers'])
+            if options['workers'] else None
+        )
+        try:
+            while True:
+                chunk = list(
+                    posts.filter(pk__gt=last_pk).values_list('pk', 'image')
+                    [:batch]
+                )
+                if not chunk:
+                    break
+                last_pk = chunk[-1][0]
+                names = [name for _, name in chunk]
+                described = (
+                    pool.map(describe_file, names) if pool
+                    else map(describe_file, names)
+                )
+                updated = []
+                for (pk, _), meta in zip(chunk, described):
+                    if meta is None:
+                        failed += 1
+                        continue
+                    updated.append(Post(pk=pk, **meta))
+                Post.objects.bulk_update(updated, Post.image_meta_fields)
+                filled += len(updated)
+                self.stdout.write(f'Заполнено: {filled}, ошибок: {failed}')
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {filled} постов, не прочитано картинок: {failed}.'
+        ))
@@ -0,0 +1,25 @@
+from posts import api_urls
+
+from . import bench_views
+
+
+class Command(bench_views.Command):
+    help = (
+        'Прогоняет адреса JSON API через тестовый клиент: полные ответы '
+        'и повторные запросы с If-None-Match. Выводит задержки, '
+        'пропускную способность и число запросов к базе в JSON.'
+    )
+    urlconf = api_urls
+    revalidate = False
+
+    def headers(self, client, url):
+        if not self.revalidate:
+            return {}
+        return {'HTTP_IF_NONE_MATCH': client.get(url).get('ETag', '')}
+
+    def measure(self, client, pattern, samples, options):
+        self.revalidate = False
+        full = super().measure(client, pattern, samples, options)
+        self.revalidate = True
+        revalidated = super().measure(client, pattern, samples, options)
+        return {'full': full, 'revalidated': revalidated}
@@ -0,0 +1,129 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from sorl.thumbnail import default, get_thumbnail
+
+from posts import thumbnails
+from posts.models import Post
+from posts.utils import number
+
+legacy_geometry = '960x339'
+legacy_options = {'crop': 'center', 'upscale': True}
+
+
+def parse_viewports(value):
+    """'360x3,1280x1' -> [(360, 3.0), (1280, 1.0)]: ширина CSS и DPR."""
+    try:
+        return [
+            (int(width), float(dpr))
+            for width, dpr in (item.split('x') for item in value.split(','))
+        ]
+    except ValueError:
+        raise CommandError(f'Неверный список экранов: {value}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает байты картинок на страницах главной ленты: одна '
+        'миниатюра 960x339 против варианта из srcset, который выберет '
+        'браузер, для нескольких экранов. Выводит JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--rendition', default='feed')
+        parser.add_argument(
+            '--viewports', type=parse_viewports,
+            default=parse_viewports('360x3,414x2,768x2,1280x1,1920x2'),
+            help='Экраны как ширинаxDPR через запятую.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для JSON вместо стандартного вывода.'
+        )
+
+    def handle(self, *args, **options):
+        rendition = options['rendition']
+        if rendition not in settings.POST_IMAGE_RENDITIONS:
+            raise CommandError(f'Нет рендишена {rendition}')
+        self.spec = settings.POST_IMAGE_RENDITIONS[rendition]
+        self.variants = list(thumbnails.variants(rendition))
+        paginator = Paginator(Post.objects.for_feed(), number)
+        pages = range(1, min(options['pages'], paginator.num_pages) + 1)
+        before = 0
+        after = {viewport: {} for viewport in options['viewports']}
+        images = broken = 0
+        for page_number in pages:
+            for post in paginator.page(page_number):
+                if not post.image:
+                    continue
+                try:
+                    legacy = self.legacy_size(post)
+                    sizes = self.variant_sizes(post)
+                except Exception:
+                    broken += 1
+                    continue
+                images += 1
+                before += legacy
+                for viewport, chosen in after.items():
+                    for image_format in self.spec['formats']:
+                        chosen[image_format] = chosen.get(
+                            image_format, 0
+                        ) + sizes[image_format, self.pick(*viewport)]
+        report = {
+            'pages': len(pages),
+            'images': images,
+            'broken_images': broken,
+            'before_bytes_per_page': self.per_page(before, pages),
+            'after': {
+                f'{width}x{dpr:g}': {
+                    image_format: {
+                        'bytes_per_page': self.per_page(total, pages),
+                        'saving': (
+                            round(1 - total / before, 3) if before else None
+                        ),
+                    }
+                    for image_format, total in chosen.items()
+                }
+                for (width, dpr), chosen in after.items()
+            },
+        }
+        result = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(result)
+        else:
+            self.stdout.write(result)
+
+    @staticmethod
+    def per_page(total, pages):
+        return round(total / len(pages)) if pages else 0
+
+    def legacy_size(self, post):
+        thumbnail = get_thumbnail(
+            post.image, legacy_geometry, **legacy_options
+        )
+        return default.storage.size(thumbnail.name)
+
+    def variant_sizes(self, post):
+        """Размеры файлов всех вариантов; недостающие создаются."""
+        name = post.image.name
+        thumbnails.backend.register(
+            name, *thumbnails.backend.render(name, thumbnails.geometries())
+        )
+        return {
+            (image_format, width): default.storage.size(
+                thumbnails.backend.resolve(name, geometry, options)[1].name
+            )
+            for image_format, width, geometry, options in self.variants
+        }
+
+    def pick(self, css_width, dpr):
+        """Ширина, которую браузер возьмет из srcset для слота
+        min(экран, ширина пропорции) при данном DPR."""
+        needed = min(css_width, self.spec['ratio'][0]) * dpr
+        widths = sorted(self.spec['widths'])
+        return next(
+            (width for width in widths if width >= needed), widths[-1]
+        )
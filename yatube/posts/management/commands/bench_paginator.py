@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.loader import get_template
+
+from posts.utils import number
+
+# Прежняя навигация: ссылка на каждую страницу из page_range.
+legacy_template = '''
+{% for i in page_obj.paginator.page_range %}
+  {% if page_obj.number == i %}
+    <li class="page-item active"><span class="page-link">{{ i }}</span></li>
+  {% else %}
+    <li class="page-item">
+      <a class="page-link" href="?page={{ i }}">{{ i }}</a>
+    </li>
+  {% endif %}
+{% endfor %}
+'''
+
+
+def parse_counts(value):
+    return [int(item) for item in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет рендер навигации по страницам для разного числа '
+        'страниц: все номера из page_range против окна вокруг текущей. '
+        'Выводит JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=parse_counts,
+            default=parse_counts('10,100,1000,5000,50000'),
+            help='Числа страниц через запятую.'
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--output', help='Файл для JSON вместо стандартного вывода.'
+        )
+
+    def handle(self, *args, **options):
+        templates = {
+            'page_range': engines['django'].from_string(legacy_template),
+            'window': get_template('posts/includes/paginator.html'),
+        }
+        report = {}
+        for pages in options['pages']:
+            paginator = Paginator(range(pages * number), number)
+            page = paginator.page((pages + 1) // 2)
+            report[pages] = {
+                name: self.measure(template, page, options['iterations'])
+                for name, template in templates.items()
+            }
+        result = json.dumps(
+            {'iterations': options['iterations'], 'pages': report},
+            ensure_ascii=False,
+            indent=2,
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(result)
+        else:
+            self.stdout.write(result)
+
+    def measure(self, template, page, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            html = template.render({'page_obj': page})
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'ms': round(sorted(timings)[len(timings) // 2], 3),
+            'bytes': len(html.encode()),
+            'links': html.count('class="page-item'),
+        }
@@ -0,0 +1,159 @@
+import json
+import math
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import object_cache, urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(share * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все адреса posts.urls через тестовый клиент и выводит '
+        'p50/p95/p99 задержки, пропускную способность и число запросов '
+        'по каждому view в JSON. Изменения в базе откатываются.'
+    )
+    urlconf = urls
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--username',
+            help='От чьего имени ходить; по умолчанию самый активный '
+                 'подписчик.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument('--sample', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--output', help='Файл для JSON вместо стандартного вывода.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        samples = self.samples(options['sample'])
+        client = Client()
+        client.force_login(self.reader(options['username']))
+        report = {}
+        object_cache.stats.clear()
+        with transaction.atomic():
+            for pattern in self.urlconf.urlpatterns:
+                report[pattern.name] = self.measure(
+                    client, pattern, samples, options
+                )
+            transaction.set_rollback(True)
+        result = json.dumps(
+            {
+                'vendor': connection.vendor,
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+                'object_cache': object_cache.snapshot(),
+                'views': report,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(result)
+        else:
+            self.stdout.write(result)
+
+    def reader(self, username):
+        if username:
+            return User.objects.get(username=username)
+        busiest = (
+            Follow.objects.values('user').annotate(total=Count('id'))
+            .order_by('-total').values_list('user', flat=True).first()
+        )
+        user = User.objects.filter(pk=busiest).first() or User.objects.first()
+        if user is None:
+            raise CommandError(
+                'В базе нет пользователей: запустите seed_data.'
+            )
+        return user
+
+    def samples(self, size):
+        return {
+            'slug': list(
+                Group.objects.order_by('?').values_list('slug', flat=True)
+                [:size]
+            ),
+            'username': list(
+                User.objects.filter(post__isnull=False).distinct()
+                .order_by('?').values_list('username', flat=True)[:size]
+            ),
+            'post_id': list(
+                Post.objects.order_by('?').values_list('pk', flat=True)
+                [:size]
+            ),
+            # Комментарий имеет смысл только вместе со своим постом.
+            'comment_id': list(
+                Comment.objects.order_by('?').values_list('post_id', 'pk')
+                [:size]
+            ),
+        }
+
+    def headers(self, client, url):
+        """Заголовки запроса к url, время их подготовки не замеряется."""
+        return {}
+
+    def measure(self, client, pattern, samples, options):
+        converters = pattern.pattern.converters
+        if any(not samples[name] for name in converters):
+            return {'skipped': 'нет данных для параметров адреса'}
+        timings = []
+        queries = []
+        statuses = set()
+        for _ in range(options['iterations']):
+            kwargs = {
+                name: self.random.choice(samples[name])
+                for name in converters
+            }
+            if 'comment_id' in kwargs:
+                kwargs['post_id'], kwargs['comment_id'] = kwargs['comment_id']
+            url = reverse(
+                f'{self.urlconf.app_name}:{pattern.name}', kwargs=kwargs
+            )
+            headers = self.headers(client, url)
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                try:
+                    status = client.get(url, **headers).status_code
+                except Exception as error:
+                    status = type(error).__name__
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses.add(status)
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'requests_per_second': round(len(timings) / sum(timings) * 1000),
+            'queries_p50': percentile(queries, 0.5),
+            'queries_max': max(queries),
+            'statuses': sorted(statuses, key=str),
+        }
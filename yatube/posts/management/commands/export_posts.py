@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import TransferError, batch_size, export, report
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, пользователей, посты, комментарии и подписки '
+        'в JSONL, читая таблицы пачками. Файлы .gz и .zst сжимаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки.')
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько строк читать из базы за раз.'
+        )
+        parser.add_argument(
+            '--with-credentials', action='store_true',
+            help='Выгрузить хэши паролей и права пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            counts = export(
+                options['path'], options['batch_size'],
+                options['with_credentials']
+            )
+        except TransferError as error:
+            raise CommandError(error)
+        for kind, total in counts.items():
+            self.stdout.write(f'{kind}: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            report(sum(counts.values()), time.monotonic() - started)
+        ))
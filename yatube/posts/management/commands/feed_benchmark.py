@@ -0,0 +1,109 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from posts.feeds import follow_feed, forget_followers, timeline_ordering
+from posts.models import Follow, Post
+from posts.utils import MergedCursorPaginator, number
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость записи и чтения ленты подписок в режимах '
+        'push, hybrid и pull. Данные создаются во временной транзакции '
+        'и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', default='10,100,1000,5000',
+            help='Число подписчиков у каждого автора, через запятую.'
+        )
+        parser.add_argument(
+            '--threshold', type=int, default=500,
+            help='FEED_PULL_THRESHOLD для гибридного режима.'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=5,
+            help='Сколько постов публикует каждый автор.'
+        )
+
+    def handle(self, *args, **options):
+        followers = [int(n) for n in options['followers'].split(',')]
+        modes = (
+            ('push', max(followers)),
+            ('hybrid', options['threshold']),
+            ('pull', 0),
+        )
+        self.stdout.write(
+            f'{"mode":<8}{"threshold":>10}{"write ms":>10}'
+            f'{"write q":>9}{"read ms":>9}{"read q":>8}'
+        )
+        for mode, threshold in modes:
+            with override_settings(FEED_PULL_THRESHOLD=threshold):
+                write, read = self.measure(followers, options['posts'])
+            self.stdout.write(
+                f'{mode:<8}{threshold:>10}{write[0]:>10.1f}'
+                f'{write[1]:>9}{read[0]:>9.1f}{read[1]:>8}'
+            )
+
+    def measure(self, followers, posts):
+        with transaction.atomic():
+            User.objects.bulk_create(
+                User(username=f'feed_bench_user_{num}')
+                for num in range(max(followers))
+            )
+            User.objects.bulk_create(
+                User(username=f'feed_bench_author_{num}')
+                for num in range(len(followers))
+            )
+            # SQLite не возвращает pk из bulk_create.
+            users = list(
+                User.objects.filter(
+                    username__startswith='feed_bench_user_'
+                ).order_by('pk')
+            )
+            authors = list(
+                User.objects.filter(
+                    username__startswith='feed_bench_author_'
+                ).order_by('pk')
+            )
+            Follow.objects.bulk_create(
+                Follow(user=user, author=author)
+                for author, n in zip(authors, followers)
+                for user in users[:n]
+            )
+            for author in authors:
+                forget_followers(author.pk)
+
+            write = self.timed(
+                lambda: [
+                    Post.objects.create(text='benchmark', author=author)
+                    for author in authors
+                    for _ in range(posts)
+                ]
+            )
+            read = self.timed(
+                lambda: list(
+                    MergedCursorPaginator(
+                        follow_feed(users[0]), number, timeline_ordering
+                    ).page()
+                )
+            )
+            for author in authors:
+                forget_followers(author.pk)
+            transaction.set_rollback(True)
+        return write, read
+
+    @staticmethod
+    def timed(action):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            action()
+            elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, len(queries)
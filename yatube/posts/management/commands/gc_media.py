@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.blobs import batch_size, collect_garbage, grace_period
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок, на которые не ссылается ни один пост, '
+        'и файлы миниатюр, которых нет в kvstore. Работает пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько файлов проверять за один запрос.'
+        )
+        parser.add_argument(
+            '--grace-hours', type=float,
+            default=grace_period.total_seconds() / 3600,
+            help='Не трогать файлы, измененные за это время.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать файлы, ничего не удаляя.'
+        )
+
+    def handle(self, *args, **options):
+        removed = collect_garbage(
+            options['batch_size'],
+            timedelta(hours=options['grace_hours']),
+            options['dry_run'],
+        )
+        for kind, files in removed.items():
+            self.stdout.write(self.style.SUCCESS(f'{kind}: {files}'))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (Checkpoint, Importer, TransferError, batch_size,
+                            report, verify)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts пачками через bulk_create '
+        'и пересобирает ленты, счетчики и поиск. С --verify только '
+        'сравнивает число записей и контрольные суммы файла и базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки.')
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько записей вставлять одним запросом.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл отметки: прерванная загрузка продолжится с нее.'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Не загружать, а сверить файл с базой.'
+        )
+        parser.add_argument(
+            '--with-credentials', action='store_true',
+            help='Взять из файла хэши паролей и права пользователей; '
+                 'без флага вход по паролю закрыт, а прав нет.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            if options['verify']:
+                self.verify(options['path'], options['batch_size'])
+                return
+            checkpoint = (
+                Checkpoint(options['checkpoint'])
+                if options['checkpoint'] else None
+            )
+            counts = Importer(
+                options['batch_size'], checkpoint,
+                options['with_credentials']
+            ).run(options['path'])
+        except TransferError as error:
+            raise CommandError(error)
+        for kind, total in counts.items():
+            self.stdout.write(f'{kind}: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            report(sum(counts.values()), time.monotonic() - started)
+        ))
+
+    def verify(self, path, batch):
+        mismatches = verify(path, batch)
+        for kind, (in_file, in_database) in mismatches.items():
+            self.stdout.write(self.style.ERROR(
+                f'{kind}: в файле {in_file["count"]} '
+                f'({in_file["checksum"]:x}), в базе {in_database["count"]} '
+                f'({in_database["checksum"]:x})'
+            ))
+        if mismatches:
+            raise CommandError('Файл и база расходятся')
+        self.stdout.write(self.style.SUCCESS('Файл и база совпадают'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import batch_size, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс по всем постам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько постов индексировать за раз.'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано: {indexed}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import batch_size, rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблиц Follow и Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько подписок и записей обрабатывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_timelines(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах: {created}')
+        )
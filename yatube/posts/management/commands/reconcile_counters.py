@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import batch_size, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики постов авторов и групп, '
+        'комментариев к постам и ссылок на файлы картинок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=batch_size,
+            help='Сколько строк обновлять одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        updated = reconcile_counters(options['batch_size'])
+        for model, rows in updated.items():
+            self.stdout.write(self.style.SUCCESS(f'{model}: {rows}'))
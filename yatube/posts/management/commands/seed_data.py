@@ -0,0 +1,196 @@
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+
+from posts import feed_cache, search
+from posts.counters import reconcile_counters
+from posts.feeds import rebuild_timelines
+from posts.models import Comment, Follow, Group, Post
+from posts.threads import root_path
+from posts.transfer import batched, manual_dates
+
+User = get_user_model()
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса распределения Ципфа для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками с реалистичным перекосом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель Ципфа для популярности авторов и постов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней растянуть публикации.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.batch = options['batch_size']
+        self.zipf = options['zipf']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        if options['seed'] is not None:
+            self.fake.seed_instance(options['seed'])
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        self.create_follows(users, options['follows'])
+        posts = self.create_posts(users, groups, options['posts'])
+        self.create_comments(users, posts, options['comments'])
+
+        self.stdout.write('Пересборка лент, счетчиков и поиска...')
+        timelines = rebuild_timelines(self.batch)
+        reconcile_counters(self.batch)
+        search.rebuild(self.batch)
+        feed_cache.bump('index')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(users)} пользователей, {len(groups)} групп, '
+            f'{len(posts)} постов, {timelines} записей в лентах.'
+        ))
+
+    def bulk_insert(self, model, objects):
+        """Вставляет пачками и возвращает pk новых строк.
+
+        SQLite не возвращает pk из bulk_create, поэтому они читаются
+        по диапазону после последнего существующего.
+        """
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        for batch in batched(objects, self.batch):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return list(
+            model.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def create_users(self, count):
+        self.stdout.write(f'Пользователи: {count}')
+        suffix = self.random.randrange(10 ** 6)
+        return self.bulk_insert(User, (
+            User(
+                username=f'{self.fake.user_name()}_{suffix}_{num}'[:150],
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password='!',
+            )
+            for num in range(count)
+        ))
+
+    def create_groups(self, count):
+        self.stdout.write(f'Группы: {count}')
+        suffix = self.random.randrange(10 ** 6)
+        return self.bulk_insert(Group, (
+            Group(
+                title=self.fake.sentence(nb_words=3)[:200],
+                description=self.fake.paragraph(),
+                slug=f'group-{suffix}-{num}',
+            )
+            for num in range(count)
+        ))
+
+    def create_follows(self, users, count):
+        """Подписки: читатель случайный, автор по Ципфу, так что
+        несколько авторов собирают большую часть подписчиков."""
+        self.stdout.write(f'Подписки: {count}')
+        weights = zipf_weights(len(users), self.zipf)
+        self.bulk_insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in zip(
+                (self.random.choice(users) for _ in range(count)),
+                (
+                    self.random.choices(users, cum_weights=weights)[0]
+                    for _ in range(count)
+                ),
+            )
+            if user_id != author_id
+        ))
+
+    def bursts(self, users, count):
+        """Даты публикаций сериями: автор пишет несколько постов подряд
+        с интервалом в минуты, между сериями - дни."""
+        weights = zipf_weights(len(users), self.zipf)
+        span = (self.now - self.start).total_seconds()
+        produced = 0
+        while produced < count:
+            author_id = self.random.choices(users, cum_weights=weights)[0]
+            moment = self.start + timedelta(
+                seconds=self.random.uniform(0, span)
+            )
+            for _ in range(min(self.random.randint(1, 8), count - produced)):
+                moment += timedelta(seconds=self.random.expovariate(1 / 600))
+                yield author_id, min(moment, self.now)
+                produced += 1
+
+    def create_posts(self, users, groups, count):
+        self.stdout.write(f'Посты: {count}')
+        with manual_dates(Post._meta.get_field('pub_date')):
+            return self.bulk_insert(Post, (
+                Post(
+                    text=self.fake.text(max_nb_chars=400),
+                    author_id=author_id,
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.7 else None
+                    ),
+                    pub_date=pub_date,
+                )
+                for author_id, pub_date in self.bursts(users, count)
+            ))
+
+    def create_comments(self, users, posts, count):
+        """Комментарии собираются на немногих популярных постах."""
+        self.stdout.write(f'Комментарии: {count}')
+        if not posts:
+            return
+        published = dict(
+            Post.objects.filter(pk__gte=posts[0]).values_list(
+                'pk', 'pub_date'
+            ).iterator(chunk_size=self.batch)
+        )
+        ranked = posts[:]
+        self.random.shuffle(ranked)
+        weights = zipf_weights(len(ranked), self.zipf)
+
+        def comment():
+            post_id = self.random.choices(ranked, cum_weights=weights)[0]
+            created = published[post_id] + timedelta(
+                seconds=self.random.expovariate(1 / 86400)
+            )
+            return Comment(
+                post_id=post_id,
+                author_id=self.random.choice(users),
+                text=self.fake.sentence(),
+                created=min(created, self.now),
+            )
+
+        with manual_dates(Comment._meta.get_field('created')):
+            self.bulk_insert(Comment, (comment() for _ in range(count)))
+        Comment.objects.filter(path='').update(path=root_path())
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_existing_images(apps, schema_editor):
+    """Заводит файлы для уже загруженных картинок, чтобы сборщик
+    мусора не счел их лишними."""
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    images = (
+        Post.objects.exclude(image='').order_by()
+        .values_list('image').annotate(total=Count('pk'))
+    )
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=name, ref_count=total)
+         for name, total in images.iterator()),
+        batch_size=10000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_meta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+                ('changed', models.DateTimeField(auto_now=True, verbose_name='Изменен')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, help_text='Добавьте картинку', storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(
+            count_existing_images, migrations.RunPython.noop
+        ),
+    ]
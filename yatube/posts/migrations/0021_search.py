@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:30
+
+from django.db import migrations
+
+from posts.stemmer import stems
+
+postgres_forward = (
+    'ALTER TABLE posts_post ADD COLUMN search_vector tsvector',
+    "UPDATE posts_post SET search_vector = to_tsvector('russian', text)",
+    'CREATE INDEX post_search_vector_idx ON posts_post '
+    'USING gin (search_vector)',
+    'CREATE TRIGGER post_search_vector_update '
+    'BEFORE INSERT OR UPDATE OF text ON posts_post FOR EACH ROW '
+    'EXECUTE PROCEDURE tsvector_update_trigger('
+    "search_vector, 'pg_catalog.russian', text)",
+)
+postgres_backward = (
+    'DROP TRIGGER post_search_vector_update ON posts_post',
+    'ALTER TABLE posts_post DROP COLUMN search_vector',
+)
+
+
+def create_index(apps, schema_editor):
+    """FTS5 на SQLite или tsvector на Postgres, сразу заполненные."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in postgres_forward:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5(stems)'
+        )
+        Post = apps.get_model('posts', 'Post')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_post_fts (rowid, stems) VALUES (%s, %s)',
+                (
+                    (pk, stems(text)) for pk, text in
+                    Post.objects.values_list('pk', 'text').iterator()
+                )
+            )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in postgres_backward:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
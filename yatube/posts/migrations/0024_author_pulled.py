@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_pulled(apps, schema_editor):
+    """Авторы, которые уже выше FEED_PULL_THRESHOLD, читаются напрямую
+    и должны остаться в этом режиме, опустившись между порогами."""
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    popular = Follow.objects.order_by().values('author_id').annotate(
+        followers=Count('id')
+    ).filter(followers__gt=settings.FEED_PULL_THRESHOLD)
+    authors = list(popular.values_list('author_id', flat=True))
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(author_id=author_id) for author_id in authors),
+        ignore_conflicts=True,
+    )
+    AuthorStats.objects.filter(author_id__in=authors).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled',
+            field=models.BooleanField(default=False, help_text='Автор перешел FEED_PULL_THRESHOLD и еще не опустился до FEED_PUSH_THRESHOLD', verbose_name='Читается в ленту напрямую'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -8,6 +10,9 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     slug = models.SlugField(unique=True)
+    post_count = models.PositiveIntegerField(
+        'Количество постов', default=0, editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -17,12 +22,38 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов с заранее подгруженными связями для шаблонов."""
+    author_fields = (
+        'author__username', 'author__first_name', 'author__last_name',
+    )
+
+    def for_feed(self):
+        """Лента: автор и группа одним JOIN, только выводимые колонки."""
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'pub_date', 'image', *Post.image_meta_fields,
+            'comment_count', 'author', 'group', *self.author_fields,
+            'group__title', 'group__slug',
+        )
+
+    def for_profile(self):
+        """Профиль: автор общий для всех постов, группа не выводится."""
+        return self.select_related('author').only(
+            'id', 'text', 'pub_date', 'image', *Post.image_meta_fields,
+            'comment_count', 'author', 'group', *self.author_fields,
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True,
+        help_text='Меняется при правке поста и его комментариев'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,11 +72,47 @@ class Post(models.Model):
         verbose_name='Картинка',
         blank=True,
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        db_index=True,
         help_text='Добавьте картинку'
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        'Размытое превью картинки', blank=True, editable=False,
+        help_text='Крошечная копия картинки как data URI'
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки', max_length=7, blank=True, editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    image_meta_fields = (
+        'image_width', 'image_height', 'image_placeholder', 'image_color',
+    )
 
     class Meta:
-        ordering = ["-pub_date"]
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-updated_at'],
+                         name='post_author_updated_idx'),
+            models.Index(fields=['group', '-updated_at'],
+                         name='post_group_updated_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -53,6 +120,46 @@ class Post(models.Model):
         return self.text[:15]
 
 
+class AuthorStats(models.Model):
+    """Счетчики автора, которые иначе пришлось бы считать COUNT(*)."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    post_count = models.PositiveIntegerField('Количество постов', default=0)
+    pulled = models.BooleanField(
+        'Читается в ленту напрямую',
+        default=False,
+        help_text='Автор перешел FEED_PULL_THRESHOLD и еще не опустился '
+                  'до FEED_PUSH_THRESHOLD'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.author}: {self.post_count}'
+
+
+class MediaBlob(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него
+    ссылаются."""
+    name = models.CharField('Имя файла', max_length=100, primary_key=True)
+    ref_count = models.PositiveIntegerField('Количество ссылок', default=0)
+    changed = models.DateTimeField('Изменен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.ref_count}'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -69,14 +176,58 @@ class Comment(models.Model):
         verbose_name='Комментарий к посту'
     )
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        'Путь в ветке', max_length=255, blank=True, editable=False,
+        help_text='id предков и самого комментария через точку'
+    )
+    reply_count = models.PositiveIntegerField(
+        'Количество ответов', default=0, editable=False,
+        help_text='Все ответы в ветке под комментарием'
+    )
+
+    # Сегменты пути одной ширины, чтобы строковый порядок путей
+    # совпадал с обходом дерева: предок, его ответы, следующий предок.
+    path_width = 10
+    max_depth = 4
 
     class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['-created'], name='comment_created_idx'),
+            models.Index(fields=['post', 'parent', 'created'],
+                         name='comment_post_roots_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def __str__(self):
         return self.text[:10]
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if not self.path:
+            # Путь включает собственный id, известный только после INSERT.
+            segment = f'{self.pk:0{self.path_width}d}'
+            self.path = (
+                f'{self.parent.path}.{segment}' if self.parent_id
+                else segment
+            )
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def depth(self):
+        return self.path.count('.')
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -87,10 +238,39 @@ class Follow(models.Model):
     )
 
     class Meta:
-        models.UniqueConstraint(fields=['user', 'author'],
-                                name='unique_following')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_following'),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
-        return self.author
+        return f'{self.user} {self.author}'
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: запись на каждый пост автора,
+    на которого подписан пользователь."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_post'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.user} {self.post}'
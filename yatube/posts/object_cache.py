@@ -0,0 +1,151 @@
+"""Кэш горячих строк Post, Group и User поверх django.core.cache.
+
+Объект хранится под ключом по pk, а поиск по slug группы и имени
+пользователя - через ключ-ссылку на pk. Сигналы при сохранении и
+удалении сбрасывают ключ объекта и ссылки на его текущие значения;
+UPDATE в обход сигналов (счетчики, массовые операции) сбрасывают
+ключи по pk сами. Ссылка, оставшаяся после переименования, указывает
+на объект с другим значением поля и считается промахом.
+
+Отсутствующие объекты тоже кэшируются, ненадолго, чтобы запросы
+к несуществующим адресам не доходили до базы.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+# Поля, по которым объект ищется помимо pk, по модели.
+lookups = {
+    'posts.post': (),
+    'posts.group': ('slug',),
+    settings.AUTH_USER_MODEL.lower(): ('username',),
+}
+# Колонки, которые попадают в кэш; хэш пароля и права пользователя
+# в общем кэше не хранятся.
+columns = {
+    settings.AUTH_USER_MODEL.lower(): (
+        'id', 'username', 'first_name', 'last_name'
+    ),
+}
+missing = 'missing'
+
+# Попадания и промахи по моделям в этом процессе.
+stats = defaultdict(Counter)
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _key(model, field, value):
+    return f'objects:{_label(model)}:{field}:{value}'
+
+
+def get_many(model, values, field='pk'):
+    """{значение: объект} для найденных значений поля; то, чего нет
+    в кэше, читается одним запросом."""
+    label = _label(model)
+    values = list(dict.fromkeys(values))
+    if field == 'pk':
+        pks = {value: value for value in values}
+    else:
+        aliases = cache.get_many([_key(model, field, v) for v in values])
+        pks = {
+            value: aliases[_key(model, field, value)] for value in values
+            if _key(model, field, value) in aliases
+        }
+    keys = {
+        _key(model, 'pk', pk): value
+        for value, pk in pks.items() if pk != missing
+    }
+    cached = cache.get_many(keys) if keys else {}
+    found = {}
+    for key, value in keys.items():
+        instance = cached.get(key)
+        if instance is not None and (
+            instance == missing or getattr(instance, field) == value
+        ):
+            found[value] = instance
+    known = {value for value, pk in pks.items() if pk == missing}
+    stats[label]['hits'] += len(found) + len(known)
+    misses = [value for value in values if value not in found.keys() | known]
+    if misses:
+        stats[label]['misses'] += len(misses)
+        found.update(_load(model, field, misses))
+    return {
+        value: instance for value, instance in found.items()
+        if instance != missing
+    }
+
+
+def _load(model, field, values):
+    queryset = model._default_manager.filter(**{f'{field}__in': values})
+    if _label(model) in columns:
+        queryset = queryset.only(*columns[_label(model)])
+    loaded = {getattr(instance, field): instance for instance in queryset}
+    entries = {}
+    absent = {}
+    for value in values:
+        instance = loaded.get(value)
+        if instance is None:
+            absent[_key(model, field, value)] = missing
+            continue
+        entries[_key(model, 'pk', instance.pk)] = instance
+        if field != 'pk':
+            entries[_key(model, field, value)] = instance.pk
+    if entries:
+        cache.set_many(entries, settings.OBJECT_CACHE_TIMEOUT)
+    if absent:
+        cache.set_many(absent, settings.OBJECT_CACHE_MISSING_TIMEOUT)
+    return loaded
+
+
+def get_or_404(model, **lookup):
+    """Объект по одному полю, pk или из lookups, или Http404."""
+    (field, value), = lookup.items()
+    instance = get_many(model, [value], field).get(value)
+    if instance is None:
+        raise Http404(f'{model._meta.object_name} не найден.')
+    return instance
+
+
+def attach(instances, *fields):
+    """Подставляет объектам связанные по внешним ключам fields
+    из кэша: по одному get_many на поле для всего списка."""
+    if not instances:
+        return instances
+    for name in fields:
+        field = instances[0]._meta.get_field(name)
+        found = get_many(field.related_model, {
+            getattr(instance, field.attname) for instance in instances
+        } - {None})
+        for instance in instances:
+            related = found.get(getattr(instance, field.attname))
+            if related is not None or field.null:
+                setattr(instance, name, related)
+    return instances
+
+
+def forget(model, *pks):
+    """Сбрасывает объекты по pk после UPDATE в обход сигналов."""
+    if _label(model) in lookups and pks:
+        cache.delete_many([_key(model, 'pk', pk) for pk in pks])
+
+
+def forget_instance(instance):
+    """Сбрасывает объект и ссылки на текущие значения его полей:
+    там мог лежать кэш отсутствия."""
+    model = type(instance)
+    cache.delete_many([
+        _key(model, 'pk', instance.pk),
+        *(
+            _key(model, field, getattr(instance, field))
+            for field in lookups[_label(model)]
+        ),
+    ])
+
+
+def snapshot():
+    return {label: dict(counter) for label, counter in stats.items()}
@@ -0,0 +1,172 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite индекс - виртуальная таблица FTS5 с основами слов из
+posts.stemmer, ее обновляют сигналы. На Postgres - колонка tsvector
+с конфигурацией russian и GIN-индексом, ее обновляет триггер. Обе
+таблицы создает миграция 0021_search.
+"""
+from django.db import connection
+
+from .models import Post
+from .stemmer import stem, stems, word_pattern
+from .utils import CursorPaginator
+
+batch_size = 1000
+fts_table = 'posts_post_fts'
+search_ordering = ('search_rank', 'id')
+
+
+class SQLiteSearch:
+    """FTS5 с ранжированием bm25: чем меньше, тем выше в выдаче."""
+    synced_by_trigger = False
+
+    def expression(self, query):
+        terms = [f'"{stem(word)}"' for word in word_pattern.findall(query)]
+        return ' AND '.join(terms)
+
+    def matches(self, query):
+        return (
+            f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s',
+            [self.expression(query)],
+        )
+
+    def ranked(self, query):
+        return (
+            f'SELECT rowid AS id, rank AS search_rank FROM {fts_table} '
+            f'WHERE {fts_table} MATCH %s',
+            [self.expression(query)],
+        )
+
+    def index(self, posts):
+        rows = [(pk, stems(text)) for pk, text in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {fts_table} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {fts_table} (rowid, stems) VALUES (%s, %s)',
+                rows
+            )
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {fts_table} WHERE rowid = %s',
+                [(pk,) for pk in pks]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {fts_table}')
+
+
+class PostgresSearch:
+    """tsvector по конфигурации russian, ранжирование ts_rank со
+    знаком минус, чтобы порядок был тем же, что у bm25."""
+    synced_by_trigger = True
+
+    def matches(self, query):
+        return (
+            'SELECT id FROM posts_post '
+            "WHERE search_vector @@ plainto_tsquery('russian', %s)",
+            [query],
+        )
+
+    def ranked(self, query):
+        return (
+            "SELECT id, -ts_rank(search_vector, plainto_tsquery("
+            "'russian', %s)) AS search_rank FROM posts_post "
+            "WHERE search_vector @@ plainto_tsquery('russian', %s)",
+            [query, query],
+        )
+
+    def index(self, posts):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE posts_post SET search_vector = "
+                "to_tsvector('russian', text) WHERE id = ANY(%s)",
+                [[pk for pk, _ in posts]]
+            )
+
+    def remove(self, pks):
+        # Строка удаляется вместе с постом.
+        pass
+
+    def clear(self):
+        pass
+
+
+def backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearch()
+    return SQLiteSearch()
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос, без ранжирования."""
+    if not word_pattern.search(query):
+        return queryset.none()
+    sql, params = backend().matches(query)
+    # RawSQL в pk__in оборачивается в лишние скобки и превращается
+    # в скалярный подзапрос, поэтому условие добавляется через extra.
+    return queryset.extra(
+        where=[f'{queryset.model._meta.db_table}.id IN ({sql})'],
+        params=params,
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по паре (ранг, id): ранг считает полнотекстовый индекс,
+    посты страницы читаются одним запросом по найденным id."""
+
+    def __init__(self, query, per_page, queryset=None):
+        super().__init__(
+            queryset if queryset is not None else Post.objects.for_feed(),
+            per_page, search_ordering,
+        )
+        self.query = query
+
+    def _fetch(self, queryset, values, forward):
+        if not word_pattern.search(self.query):
+            return []
+        sql, params = backend().ranked(self.query)
+        where = ''
+        if values is not None:
+            sign = '>' if forward else '<'
+            where = (
+                f'WHERE search_rank {sign} %s '
+                f'OR (search_rank = %s AND id {sign} %s)'
+            )
+            params = [*params, values[0], values[0], values[1]]
+        direction = 'ASC' if forward else 'DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, search_rank FROM ({sql}) AS found {where} '
+                f'ORDER BY search_rank {direction}, id {direction} LIMIT %s',
+                [*params, self.per_page + 1]
+            )
+            ranks = dict(cursor.fetchall())
+        posts = queryset.order_by().in_bulk(list(ranks))
+        rows = []
+        for pk, rank in ranks.items():
+            if pk in posts:
+                posts[pk].search_rank = rank
+                rows.append(posts[pk])
+        return rows
+
+
+def rebuild(batch=batch_size):
+    """Пересобирает индекс по всем постам; возвращает их число."""
+    search = backend()
+    search.clear()
+    indexed = 0
+    last_pk = 0
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    while True:
+        chunk = list(posts.filter(pk__gt=last_pk)[:batch])
+        if not chunk:
+            return indexed
+        search.index(chunk)
+        indexed += len(chunk)
+        last_pk = chunk[-1][0]
@@ -0,0 +1,234 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed_cache, object_cache, search, thumbnails
+from .feeds import backfill_timeline, fan_out_post, prune_timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    prune_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_reset_image_meta(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    if instance.image.name != getattr(instance, '_previous_image', None):
+        for field in Post.image_meta_fields:
+            setattr(
+                instance, field, Post._meta.get_field(field).get_default()
+            )
+
+
+@receiver(post_save, sender=Post)
+def post_prepare_thumbnails(sender, instance, **kwargs):
+    image = instance.image.name
+    if image and image != getattr(instance, '_previous_image', None):
+        transaction.on_commit(lambda: thumbnails.schedule(instance))
+
+
+@receiver(post_save, sender=Post)
+def post_refer_blob(sender, instance, **kwargs):
+    image = instance.image.name
+    previous = getattr(instance, '_previous_image', None)
+    if image != previous:
+        counters.shift_blob_refs(previous, -1)
+        counters.shift_blob_refs(image, 1)
+
+
+@receiver(post_save, sender=Post)
+def post_index_text(sender, instance, update_fields=None, **kwargs):
+    backend = search.backend()
+    if backend.synced_by_trigger:
+        return
+    if update_fields is None or 'text' in update_fields:
+        backend.index([(instance.pk, instance.text)])
+
+
+@receiver(post_save, sender=Post)
+def post_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_author_posts(instance.author_id, 1)
+        counters.shift_group_posts(instance.group_id, 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        counters.shift_group_posts(previous_group_id, -1)
+        counters.shift_group_posts(instance.group_id, 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_post_comments(instance.post_id, 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_replies_on_save(sender, instance, created, **kwargs):
+    if created and instance.parent_id:
+        counters.shift_replies(instance.parent.path, 1)
+
+
+@receiver(post_save, sender=Post)
+def post_invalidate_feeds(sender, instance, **kwargs):
+    feed_cache.bump(*feed_cache.post_scopes(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_previous_group_id', None),
+    ))
+
+
+@receiver(post_save, sender=Comment)
+def comment_invalidate_feeds(sender, instance, **kwargs):
+    if Comment.post.is_cached(instance):
+        post = (instance.post.author_id, instance.post.group_id)
+    else:
+        post = Post.objects.filter(pk=instance.post_id).values_list(
+            'author_id', 'group_id'
+        ).first()
+    if post is not None:
+        feed_cache.bump(*feed_cache.post_scopes(*post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_invalidate_feeds(sender, instance, **kwargs):
+    feed_cache.bump('index', f'group:{instance.pk}')
+
+
+# Поля автора, которые выводятся в лентах рядом с постами.
+author_fields = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def author_remember_previous(sender, instance, update_fields=None,
+                             **kwargs):
+    instance._previous_names = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        author_fields
+    ):
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*author_fields).first()
+
+
+@receiver(post_save, sender=User)
+def author_invalidate_feeds(sender, instance, created, **kwargs):
+    # Новый пользователь еще нигде не выводится.
+    previous = getattr(instance, '_previous_names', None)
+    if created or previous is None:
+        return
+    if previous != tuple(getattr(instance, field) for field in author_fields):
+        feed_cache.bump('authors')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_object(sender, instance, **kwargs):
+    object_cache.forget_instance(instance)
+
+
+def posts_deleted(rows):
+    """Счетчики, файлы, поиск и кэши после удаления постов.
+
+    rows - (pk, author_id, group_id, image) удаленных постов. Функцию
+    зовут и post_delete на каждый пост, и bulk.delete_posts, который
+    удаляет без сигналов, поэтому новые последствия удаления поста
+    добавляются сюда, а не отдельным receiver.
+    """
+    rows = list(rows)
+    pks = [pk for pk, _, _, _ in rows]
+    authors = Counter(author_id for _, author_id, _, _ in rows)
+    groups = Counter(group_id for _, _, group_id, _ in rows if group_id)
+    images = Counter(image for _, _, _, image in rows if image)
+    for author_id, count in authors.items():
+        counters.shift_author_posts(author_id, -count)
+    for group_id, count in groups.items():
+        counters.shift_group_posts(group_id, -count)
+    for image, count in images.items():
+        counters.shift_blob_refs(image, -count)
+    search.backend().remove(pks)
+    object_cache.forget(Post, *pks)
+    scopes = set()
+    for _, author_id, group_id, _ in rows:
+        scopes.update(feed_cache.post_scopes(author_id, group_id))
+    feed_cache.bump(*scopes)
+
+
+def comments_deleted(rows):
+    """Счетчики и кэши после удаления комментариев.
+
+    rows - (post_id, path) удаленных комментариев; как posts_deleted,
+    общая для post_delete и bulk.delete_comments.
+    """
+    rows = list(rows)
+    deleted = {int(path.rpartition('.')[2]) for _, path in rows if path}
+    # Последний сегмент пути - сам комментарий, остальные - предки.
+    ancestors = Counter(
+        int(segment)
+        for _, path in rows
+        for segment in path.split('.')[:-1]
+    )
+    counters.release_replies({
+        pk: count for pk, count in ancestors.items() if pk not in deleted
+    })
+    posts = Counter(post_id for post_id, _ in rows)
+    for post_id, count in posts.items():
+        counters.shift_post_comments(post_id, -count)
+    scopes = set()
+    for author_id, group_id in Post.objects.filter(
+        pk__in=list(posts)
+    ).values_list('author_id', 'group_id'):
+        scopes.update(feed_cache.post_scopes(author_id, group_id))
+    feed_cache.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    posts_deleted([(
+        instance.pk, instance.author_id, instance.group_id,
+        instance.image.name,
+    )])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comments_deleted([(instance.post_id, instance.path)])
@@ -0,0 +1,108 @@
+"""Стеммер русского языка по алгоритму Snowball.
+
+Нужен для поиска на SQLite: в FTS5 нет русской морфологии, поэтому
+в индекс и в запрос попадают уже обрезанные основы слов. На Postgres
+то же делает конфигурация russian.
+"""
+import re
+
+vowels = 'аеиоуыэюя'
+
+# True - окончание засчитывается, только если перед ним «а» или «я».
+perfective_gerund = {
+    'в': True, 'вши': True, 'вшись': True,
+    'ив': False, 'ивши': False, 'ившись': False,
+    'ыв': False, 'ывши': False, 'ывшись': False,
+}
+adjective = dict.fromkeys((
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+), False)
+participle = {
+    'ем': True, 'нн': True, 'вш': True, 'ющ': True, 'щ': True,
+    'ивш': False, 'ывш': False, 'ующ': False,
+}
+reflexive = dict.fromkeys(('ся', 'сь'), False)
+verb = {
+    **dict.fromkeys((
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ), True),
+    **dict.fromkeys((
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ), False),
+}
+noun = dict.fromkeys((
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+), False)
+derivational = dict.fromkeys(('ост', 'ость'), False)
+superlative = dict.fromkeys(('ейш', 'ейше'), False)
+word_pattern = re.compile(r'\w+')
+
+
+def _after_vowel_pair(word, start):
+    """Начало области после первой пары «гласная, согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in vowels and word[index - 1] in vowels:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, limit, endings):
+    """Снимает самое длинное окончание из endings, начинающееся не
+    раньше limit. None, если такого нет или условие не выполнено."""
+    for size in range(min(len(word) - limit, 6), 0, -1):
+        ending = word[-size:]
+        if ending not in endings:
+            continue
+        start = len(word) - size
+        if endings[ending] and not (
+            start > limit and word[start - 1] in 'ая'
+        ):
+            return None
+        return word[:start]
+    return None
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, letter in enumerate(word) if letter in vowels),
+        len(word)
+    )
+    r1 = _after_vowel_pair(word, 0)
+    r2 = _after_vowel_pair(word, r1)
+
+    removed = _remove(word, rv, perfective_gerund)
+    if removed is None:
+        word = _remove(word, rv, reflexive) or word
+        removed = _remove(word, rv, adjective)
+        if removed is not None:
+            removed = _remove(removed, rv, participle) or removed
+        else:
+            removed = _remove(word, rv, verb) or _remove(word, rv, noun)
+    word = removed if removed is not None else word
+
+    if len(word) > rv and word.endswith('и'):
+        word = word[:-1]
+    word = _remove(word, r2, derivational) or word
+
+    removed = _remove(word, rv, superlative)
+    if removed is not None:
+        word = removed[:-1] if removed.endswith('нн') else removed
+    elif word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def stems(text):
+    """Основы всех слов текста через пробел."""
+    return ' '.join(stem(word) for word in word_pattern.findall(text))
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+hash_name = 'sha256'
+temporary_suffix = '.upload'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под именем из хэша содержимого.
+
+    Хэш считается по мере записи загрузки во временный файл рядом
+    с целевым каталогом. Одинаковые загрузки получают одно имя,
+    и второй файл на диск не пишется, а у первого обновляется время
+    изменения. Каталог и расширение берутся из имени, которое
+    предложило поле.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Совпадение имени означает совпадение содержимого.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self.path(directory), suffix=temporary_suffix
+        )
+        try:
+            digest = hashlib.new(hash_name)
+            with os.fdopen(descriptor, 'wb') as output:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+                # Свежее время изменения защищает файл от сборщика,
+                # пока пост с ним еще не увеличил счетчик ссылок.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary, path)
+                os.chmod(path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
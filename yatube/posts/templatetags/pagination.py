@@ -0,0 +1,11 @@
+from django import template
+
+from .. import utils
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page, around=2):
+    """Окно номеров страниц для навигации, см. utils.page_window."""
+    return utils.page_window(page.number, page.paginator.num_pages, around)
@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_pictures(posts, rendition='feed'):
+    """Готовит варианты картинок всей страницы разом."""
+    thumbnails.prefetch_rendition(posts, rendition)
+    return ''
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(post, rendition='feed'):
+    """<picture> с srcset по вариантам рендишена или заглушка."""
+    ratio = settings.POST_IMAGE_RENDITIONS[rendition]['ratio']
+    return {
+        'post': post,
+        'picture': thumbnails.picture(post, rendition),
+        'ratio': f'{ratio[0]} / {ratio[1]}',
+    }
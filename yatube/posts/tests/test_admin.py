@@ -0,0 +1,227 @@
+from unittest import mock
+
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed_cache
+from ..bulk import delete_comments, delete_posts
+from ..counters import author_post_count
+from ..models import Comment, Follow, Group, MediaBlob, Post, Timeline
+from ..search import filter_posts
+from ..utils import EstimatedPaginator
+
+User = get_user_model()
+
+
+class AdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.user = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test_title', description='Test_description', slug='group'
+        )
+        cls.other_group = Group.objects.create(
+            title='Other_title', description='Other_description', slug='other'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(AdminTest.admin)
+
+    def create_posts(self, count, **kwargs):
+        return [
+            Post.objects.create(
+                text=f'Спам {num}', author=AdminTest.user, **kwargs
+            )
+            for num in range(count)
+        ]
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow(self):
+        """Число запросов списка не зависит от числа строк."""
+        post = self.create_posts(1, group=AdminTest.group)[0]
+        Comment.objects.create(post=post, author=AdminTest.reader, text='Ок')
+        urls = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'comment', 'follow')
+        ]
+        before = [self.changelist_queries(url) for url in urls]
+
+        other = User.objects.create_user(username='other')
+        for user in other, AdminTest.admin:
+            Follow.objects.create(user=user, author=AdminTest.user)
+        for post in self.create_posts(5, group=AdminTest.other_group):
+            Comment.objects.create(post=post, author=AdminTest.admin, text='')
+
+        self.assertEqual(
+            [self.changelist_queries(url) for url in urls], before
+        )
+
+    def test_move_to_group(self):
+        """Перенос в группу меняет посты и счетчики групп."""
+        posts = self.create_posts(3, group=AdminTest.group)
+        self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'move_to_group',
+            'group': AdminTest.other_group.pk,
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts[:2]],
+        })
+
+        self.assertEqual(
+            Post.objects.filter(group=AdminTest.other_group).count(), 2
+        )
+        AdminTest.group.refresh_from_db()
+        AdminTest.other_group.refresh_from_db()
+        self.assertEqual(AdminTest.group.post_count, 1)
+        self.assertEqual(AdminTest.other_group.post_count, 2)
+
+    def test_delete_spam(self):
+        """Удаление спама убирает посты, комментарии, записи лент и
+        индекс поиска и исправляет счетчики."""
+        posts = self.create_posts(3, group=AdminTest.group)
+        Post.objects.filter(pk=posts[0].pk).update(image='posts/spam.gif')
+        MediaBlob.objects.create(name='posts/spam.gif', ref_count=1)
+        Comment.objects.create(
+            post=posts[0], author=AdminTest.reader, text='Ок'
+        )
+        spam = [post.pk for post in posts[:2]]
+
+        self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'delete_spam', ACTION_CHECKBOX_NAME: spam,
+        })
+
+        self.assertEqual(list(Post.objects.all()), [posts[2]])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Timeline.objects.filter(post__in=spam).exists())
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'спам')), [posts[2]]
+        )
+        self.assertEqual(author_post_count(AdminTest.user), 1)
+        AdminTest.group.refresh_from_db()
+        self.assertEqual(AdminTest.group.post_count, 1)
+        self.assertEqual(
+            MediaBlob.objects.get(name='posts/spam.gif').ref_count, 0
+        )
+
+    def test_delete_spam_comments(self):
+        """Удаление спам-комментариев пересчитывает счетчик поста."""
+        post = self.create_posts(1)[0]
+        comments = [
+            Comment.objects.create(
+                post=post, author=AdminTest.reader, text=f'Спам {num}'
+            )
+            for num in range(3)
+        ]
+
+        self.client.post(reverse('admin:posts_comment_changelist'), {
+            'action': 'delete_spam',
+            ACTION_CHECKBOX_NAME: [comment.pk for comment in comments[:2]],
+        })
+
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(list(Comment.objects.all()), [comments[2]])
+
+    def deletion_result(self, delete_posts, delete_comments):
+        """Удаляет часть постов и ветку комментариев и возвращает
+        состояние счетчиков, поиска, лент и сдвинутых поколений."""
+        post, other, kept = (
+            Post.objects.create(
+                text=f'Спам {name}', author=AdminTest.user,
+                group=AdminTest.group, image=image,
+            )
+            for name, image in (
+                ('один', 'posts/spam.gif'), ('два', ''),
+                ('три', 'posts/spam.gif'),
+            )
+        )
+        root = Comment.objects.create(
+            post=post, author=AdminTest.reader, text='Корень'
+        )
+        Comment.objects.create(
+            post=post, author=AdminTest.reader, text='Ответ', parent=root
+        )
+        thread = Comment.objects.create(
+            post=kept, author=AdminTest.reader, text='Ветка'
+        )
+        branch = Comment.objects.create(
+            post=kept, author=AdminTest.reader, text='Спам', parent=thread
+        )
+        Comment.objects.create(
+            post=kept, author=AdminTest.reader, text='Вложенный',
+            parent=branch,
+        )
+        Comment.objects.create(
+            post=kept, author=AdminTest.reader, text='Остается',
+            parent=thread,
+        )
+        cache.clear()
+
+        with mock.patch.object(feed_cache, 'bump') as bump:
+            delete_posts(Post.objects.filter(pk__in=[post.pk, other.pk]))
+            delete_comments(Comment.objects.filter(pk=branch.pk))
+
+        return {
+            'authors': author_post_count(AdminTest.user),
+            'groups': dict(Group.objects.values_list('slug', 'post_count')),
+            'blobs': dict(MediaBlob.objects.values_list('name', 'ref_count')),
+            'posts': dict(Post.objects.values_list('text', 'comment_count')),
+            'replies': dict(
+                Comment.objects.values_list('text', 'reply_count')
+            ),
+            'search': [
+                post.text for post in filter_posts(Post.objects.all(), 'спам')
+            ],
+            'timeline': Timeline.objects.count(),
+            'scopes': {
+                scope for call in bump.call_args_list for scope in call[0]
+            },
+        }
+
+    def test_bulk_delete_matches_signals(self):
+        """Массовое удаление оставляет то же состояние, что удаление
+        по одному объекту с сигналами."""
+        def one_by_one(queryset):
+            for instance in queryset:
+                instance.delete()
+
+        results = []
+        for deletes in ((one_by_one, one_by_one),
+                        (delete_posts, delete_comments)):
+            with transaction.atomic():
+                results.append(self.deletion_result(*deletes))
+                transaction.set_rollback(True)
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1]['posts'], {'Спам три': 2})
+        self.assertEqual(results[1]['replies'], {'Ветка': 1, 'Остается': 0})
+        self.assertEqual(results[1]['blobs'], {'posts/spam.gif': 1})
+
+    def test_estimated_count(self):
+        """Сверх предела вместо точного числа строк берется оценка."""
+        self.create_posts(5)
+        self.addCleanup(cache.clear)
+        with override_settings(
+            COUNT_ESTIMATE_THRESHOLD=2, COUNT_ESTIMATE_WORKERS=0
+        ):
+            paginator = EstimatedPaginator(Post.objects.all(), 2)
+            self.assertGreaterEqual(paginator.count, 5)
+            paginator = EstimatedPaginator(
+                Post.objects.filter(text='Спам 1'), 2
+            )
+            self.assertEqual(paginator.count, 1)
@@ -0,0 +1,143 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test_title', description='Test_description', slug='group'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(12)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """Ленты отдают посты страницами по курсору."""
+        for url in (
+            reverse('api:index'),
+            reverse('api:group_posts', args=[ApiTest.group.slug]),
+            reverse('api:profile', args=[ApiTest.user.username]),
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url, {'limit': 10}).json()
+                second = self.client.get(
+                    url, {'limit': 10, 'cursor': first['next']}
+                ).json()
+
+                self.assertEqual(len(first['results']), 10)
+                self.assertEqual(len(second['results']), 2)
+                self.assertIsNone(second['next'])
+                self.assertEqual(
+                    first['results'][0]['author'], ApiTest.user.username
+                )
+                self.assertEqual(first['results'][0]['group'], 'group')
+
+    def test_fields(self):
+        """fields оставляет только нужные поля, неизвестное поле - 400."""
+        url = reverse('api:post_detail', args=[ApiTest.post.pk])
+
+        response = self.client.get(url, {'fields': 'id,text'})
+        self.assertEqual(
+            response.json(), {'id': ApiTest.post.pk, 'text': ApiTest.post.text}
+        )
+
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_not_modified(self):
+        """Совпавший ETag дает 304 без запросов к базе, а новый пост
+        меняет ETag."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(text='Новый пост', author=ApiTest.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый пост')
+
+    def test_last_modified(self):
+        """Пост, группа и автор отдают Last-Modified и 304 по
+        If-Modified-Since; чужой пост не меняет ETag поста."""
+        urls = (
+            reverse('api:post_detail', args=[ApiTest.post.pk]),
+            reverse('api:group_posts', args=[ApiTest.group.slug]),
+            reverse('api:profile', args=[ApiTest.user.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                cached = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+
+        etag = self.client.get(urls[0])['ETag']
+        Post.objects.create(text='Чужой пост', author=ApiTest.reader)
+        response = self.client.get(urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_comments(self):
+        """Комментарий меняет ETag поста и виден в списке."""
+        url = reverse('api:post_comments', args=[ApiTest.post.pk])
+        etag = self.client.get(url)['ETag']
+
+        Comment.objects.create(
+            post=ApiTest.post, author=ApiTest.user, text='Еще'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            [comment['text'] for comment in response.json()['results']],
+            ['Ок', 'Еще']
+        )
+
+    def test_follow(self):
+        """Лента подписок только для авторизованных."""
+        url = reverse('api:follow_index')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+
+        self.client.force_login(ApiTest.reader)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 10)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing(self):
+        """Несуществующие группа, автор и пост - 404."""
+        for url in (
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:profile', args=['missing']),
+            reverse('api:post_detail', args=[0]),
+            reverse('api:post_comments', args=[0]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
@@ -0,0 +1,64 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import api_urls, urls
+from ..models import Comment, Follow, Group, Post, Timeline
+
+
+class SeedDataTest(TestCase):
+    def test_bench_paginator(self):
+        """bench_paginator сравнивает полную навигацию с окном."""
+        output = StringIO()
+        call_command(
+            'bench_paginator', pages=[3, 500], iterations=1, stdout=output
+        )
+        report = json.loads(output.getvalue())['pages']
+
+        self.assertEqual(report['500']['page_range']['links'], 500)
+        self.assertLess(report['500']['window']['links'], 15)
+
+    def test_seed_and_bench(self):
+        """seed_data наполняет базу, bench_views и bench_api отчитываются
+        по всем view."""
+        call_command(
+            'seed_data', users=20, groups=3, posts=60, comments=40,
+            follows=50, batch_size=7, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+
+        output = StringIO()
+        call_command('bench_views', iterations=3, seed=1, stdout=output)
+        report = json.loads(output.getvalue())['views']
+
+        self.assertEqual(
+            set(report), {pattern.name for pattern in urls.urlpatterns}
+        )
+        for name, stats in report.items():
+            with self.subTest(view=name):
+                self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+                self.assertTrue(
+                    set(stats['statuses']) <= {200, 302}, stats['statuses']
+                )
+
+        output = StringIO()
+        call_command('bench_api', iterations=3, seed=1, stdout=output)
+        report = json.loads(output.getvalue())['views']
+
+        self.assertEqual(
+            set(report), {pattern.name for pattern in api_urls.urlpatterns}
+        )
+        for name, stats in report.items():
+            with self.subTest(api=name):
+                self.assertEqual(stats['full']['statuses'], [200])
+                self.assertEqual(stats['revalidated']['statuses'], [304])
@@ -0,0 +1,103 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..utils import number
+
+User = get_user_model()
+
+
+class CommentsPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.readers = [
+            User.objects.create_user(username=f'reader_{num}')
+            for num in range(25)
+        ]
+        for num, reader in enumerate(cls.readers):
+            Comment.objects.create(
+                post=cls.post, author=reader, text=f'Комментарий №{num}.'
+            )
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.url_comments = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_first_page(self):
+        """Страница поста выводит первую страницу комментариев один
+        раз и число комментариев из счетчика."""
+        response = self.client.get(CommentsPageTest.url)
+        comments = response.context['comments']
+
+        self.assertEqual(
+            self.texts(comments),
+            [f'Комментарий №{num}.' for num in range(number)]
+        )
+        self.assertContains(response, 'Комментарий №0.', count=1)
+        self.assertNotContains(response, f'Комментарий №{number}.')
+        self.assertContains(response, 'Комментарии: 25')
+
+    def test_queries_do_not_grow(self):
+        """Авторы комментариев приходят одним JOIN: страница с десятью
+        авторами стоит столько же запросов, сколько с одним."""
+        other = Post.objects.create(text='Другой пост', author=self.user)
+        Comment.objects.create(post=other, author=self.user, text='Ок')
+
+        def queries(post):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(
+                    reverse('posts:post_detail', args=[post.pk])
+                )
+            return len(captured)
+
+        self.assertEqual(queries(CommentsPageTest.post), queries(other))
+
+    def test_fragment(self):
+        """Фрагмент отдает следующие страницы до конца."""
+        cursor = self.client.get(
+            CommentsPageTest.url
+        ).context['comments'].next_cursor
+        texts = []
+        while cursor:
+            response = self.client.get(
+                CommentsPageTest.url_comments, {'cursor': cursor}
+            )
+            self.assertNotContains(response, '<html')
+            texts += self.texts(response.context['comments'])
+            cursor = response.context['comments'].next_cursor
+
+        self.assertEqual(
+            texts, [f'Комментарий №{num}.' for num in range(number, 25)]
+        )
+
+    def test_newest_first(self):
+        """order=new выводит сначала новые комментарии."""
+        response = self.client.get(CommentsPageTest.url, {'order': 'new'})
+
+        self.assertEqual(
+            self.texts(response.context['comments'])[:2],
+            ['Комментарий №24.', 'Комментарий №23.']
+        )
+        self.assertContains(response, 'order=new&amp;cursor=')
+
+    def test_missing_post(self):
+        """Фрагмент несуществующего поста - 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[0])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,106 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ConditionalTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Test_title', description='Test_description', slug='group'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:post_detail', args=[cls.post.pk]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:group_list', args=[cls.group.slug]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalTest.user)
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдает 304 одним запросом к базе,
+        а по If-Modified-Since - так же без рендера."""
+        for url in ConditionalTest.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+                for headers in (
+                    {'HTTP_IF_NONE_MATCH': response['ETag']},
+                    {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+                ):
+                    with self.assertNumQueries(1):
+                        cached = self.client.get(url, **headers)
+                    self.assertEqual(
+                        cached.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+                    self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_authorized_not_modified(self):
+        """Для авторизованного к валидатору добавляются только сессия
+        и пользователь."""
+        url = ConditionalTest.urls[0]
+        etag = self.authorized_client.get(url)['ETag']
+
+        with self.assertNumQueries(3):
+            response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes(self):
+        """Правка поста, комментарий и вход пользователя меняют ETag."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[ConditionalTest.post.pk]),
+            {'text': 'Новый текст', 'group': ConditionalTest.group.pk},
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Новый текст')
+
+        url = ConditionalTest.urls[0]
+        etag = self.client.get(url)['ETag']
+        updated_at = Post.objects.get(pk=ConditionalTest.post.pk).updated_at
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[ConditionalTest.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertGreater(
+            Post.objects.get(pk=ConditionalTest.post.pk).updated_at,
+            updated_at
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Комментарий')
+
+        etag = response['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_unrelated_post(self):
+        """Пост другого автора вне группы не меняет ETag страницы поста."""
+        url = ConditionalTest.urls[0]
+        etag = self.client.get(url)['ETag']
+        other = User.objects.create_user(username='other')
+
+        Post.objects.create(text='Чужой пост', author=other)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
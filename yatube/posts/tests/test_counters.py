@@ -0,0 +1,175 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import author_post_count
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Test_title',
+            description='Test_description',
+            slug='Group',
+        )
+        cls.other_group = Group.objects.create(
+            title='Other_title',
+            description='Other_description',
+            slug='Other',
+        )
+
+    def assertCounts(self, author_posts, group_posts, other_posts):
+        self.assertEqual(author_post_count(CountersTest.user), author_posts)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group.pk).post_count,
+            group_posts
+        )
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.other_group.pk).post_count,
+            other_posts
+        )
+
+    def test_post_counters(self):
+        """Счетчики постов следуют за созданием, переносом и удалением."""
+        post = Post.objects.create(
+            text='text', author=CountersTest.user, group=CountersTest.group
+        )
+        Post.objects.create(text='text', author=CountersTest.user)
+        self.assertCounts(2, 1, 0)
+
+        post.group = CountersTest.other_group
+        post.save()
+        self.assertCounts(2, 0, 1)
+
+        post.delete()
+        self.assertCounts(1, 0, 0)
+
+    def test_comment_counter(self):
+        """Счетчик комментариев поста."""
+        post = Post.objects.create(text='text', author=CountersTest.user)
+        comment = Comment.objects.create(
+            post=post, author=CountersTest.user, text='comment'
+        )
+        Comment.objects.create(
+            post=post, author=CountersTest.user, text='comment'
+        )
+        comment.delete()
+        post.refresh_from_db()
+
+        self.assertEqual(post.comment_count, 1)
+
+    def test_reconcile_counters(self):
+        """reconcile_counters исправляет расхождение после bulk_create."""
+        Post.objects.bulk_create(
+            Post(text=f'text {num}', author=CountersTest.user,
+                 group=CountersTest.group)
+            for num in range(3)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=CountersTest.user, text='comment')
+            for _ in range(2)
+        )
+        self.assertCounts(0, 0, 0)
+
+        call_command('reconcile_counters', batch_size=2, stdout=StringIO())
+
+        self.assertCounts(3, 3, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+    def test_migration_counts_existing(self):
+        """Миграция счетчиков заполняет их по существующим строкам."""
+        Post.objects.bulk_create(
+            Post(text=f'text {num}', author=CountersTest.user,
+                 group=CountersTest.group)
+            for num in range(3)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=CountersTest.user, text='comment')
+            for _ in range(2)
+        )
+        migration = import_module('posts.migrations.0016_counters')
+
+        migration.count_existing(apps, None)
+
+        self.assertCounts(3, 3, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+    def test_drifted_counter_pages(self):
+        """Разошедшийся счетчик не прячет и не выдумывает страницы."""
+        Post.objects.bulk_create(
+            Post(text=f'text {num}', author=CountersTest.user,
+                 group=CountersTest.group)
+            for num in range(12)
+        )
+        url = reverse('posts:group_list', args=[CountersTest.group.slug])
+        for count, number in ((0, 2), (100, 5)):
+            with self.subTest(count=count):
+                cache.clear()
+                Group.objects.filter(pk=CountersTest.group.pk).update(
+                    post_count=count
+                )
+
+                page = Client().get(url, {'page': number}).context[
+                    'page_obj'
+                ]
+
+                self.assertEqual(page.number, 2)
+                self.assertEqual(len(page), 2)
+                self.assertEqual(page.paginator.num_pages, 2)
+
+    def test_views_do_not_count(self):
+        """Профиль и группа берут число постов из счетчиков."""
+        Post.objects.create(
+            text='text', author=CountersTest.user, group=CountersTest.group
+        )
+        client = Client()
+        urls = (
+            reverse('posts:profile', args=[CountersTest.user.username]),
+            reverse('posts:group_list', args=[CountersTest.group.slug]),
+            reverse('posts:post_detail', args=[Post.objects.first().pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, {'page': 1})
+                self.assertNotIn(
+                    'COUNT(', ' '.join(q['sql'] for q in queries)
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_delete_under_drift(self):
+        """Удаление строк, записанных в обход сигналов, не уводит
+        счетчики ниже нуля."""
+        Post.objects.bulk_create([
+            Post(text='Без сигналов', author=self.user, group=self.group)
+        ])
+        post = Post.objects.get(text='Без сигналов')
+        root = Comment.objects.create(post=post, author=self.user, text='Ок')
+        Comment.objects.bulk_create([Comment(
+            post=post, author=self.user, text='Ответ', parent=root,
+            path=f'{root.path}.{root.pk + 1:010d}',
+        )])
+
+        Comment.objects.get(text='Ответ').delete()
+        Comment.objects.get(text='Ок').delete()
+        post.delete()
+
+        self.assertCounts(0, 0, 0)
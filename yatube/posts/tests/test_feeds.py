@@ -0,0 +1,254 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Follow, Post, Timeline
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.url_follow_index = reverse('posts:follow_index')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTest.reader)
+
+    def test_fan_out_on_create(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        post = Post.objects.create(text='text', author=TimelineTest.author)
+
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=TimelineTest.reader, post=post
+            ).exists()
+        )
+        self.assertFalse(
+            Timeline.objects.filter(user=TimelineTest.stranger).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты, отписка их убирает."""
+        Post.objects.create(text='old', author=TimelineTest.author)
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=['author'])
+        )
+        self.assertEqual(
+            Timeline.objects.filter(user=TimelineTest.reader).count(), 1
+        )
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=['author'])
+        )
+        self.assertFalse(
+            Timeline.objects.filter(user=TimelineTest.reader).exists()
+        )
+
+    def test_follow_index_pages(self):
+        """Лента подписок листается курсором без пропусков."""
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        for num in range(13):
+            Post.objects.create(text=f'text {num}', author=TimelineTest.author)
+
+        response = self.authorized_client.get(TimelineTest.url_follow_index)
+        first = response.context['page_obj']
+        response = self.authorized_client.get(
+            TimelineTest.url_follow_index, {'cursor': first.next_cursor}
+        )
+        second = response.context['page_obj']
+
+        ids = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(
+            ids,
+            list(
+                Post.objects.order_by('-pub_date', '-id').values_list(
+                    'pk', flat=True
+                )
+            )
+        )
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        Post.objects.create(text='text', author=TimelineTest.author)
+        Post.objects.create(text='text', author=TimelineTest.stranger)
+        Timeline.objects.all().delete()
+
+        call_command('rebuild_timelines', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(Timeline.objects.values_list('user', 'post__author')),
+            [(TimelineTest.reader.pk, TimelineTest.author.pk)]
+        )
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(
+    FEED_PULL_THRESHOLD=1, FEED_PUSH_THRESHOLD=1, FEED_PUSH_WORKERS=0
+)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.url_follow_index = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=HybridFeedTest.reader,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.reader,
+                              author=HybridFeedTest.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(HybridFeedTest.reader)
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты автора выше порога не раскладываются по лентам."""
+        post = Post.objects.create(text='star', author=HybridFeedTest.star)
+
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента подписок сливает материализованные и прочитанные посты."""
+        for num in range(7):
+            Post.objects.create(text=f'star {num}', author=HybridFeedTest.star)
+            Post.objects.create(
+                text=f'author {num}', author=HybridFeedTest.author
+            )
+
+        response = self.authorized_client.get(HybridFeedTest.url_follow_index)
+        first = response.context['page_obj']
+        response = self.authorized_client.get(
+            HybridFeedTest.url_follow_index, {'cursor': first.next_cursor}
+        )
+        second = response.context['page_obj']
+
+        ids = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(
+            ids,
+            list(
+                Post.objects.order_by('-pub_date', '-id').values_list(
+                    'pk', flat=True
+                )
+            )
+        )
+        self.assertFalse(second.has_next())
+
+    def test_author_drops_below_threshold(self):
+        """Посты автора, опустившегося до порога, раскладываются по
+        лентам оставшихся подписчиков и не пропадают из ленты."""
+        post = Post.objects.create(text='star', author=HybridFeedTest.star)
+
+        with mock.patch.object(transaction, 'on_commit', run_on_commit):
+            Follow.objects.get(
+                user=HybridFeedTest.fan, author=HybridFeedTest.star
+            ).delete()
+
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=HybridFeedTest.reader, post=post
+            ).exists()
+        )
+        response = self.authorized_client.get(HybridFeedTest.url_follow_index)
+        self.assertIn(post, response.context['page_obj'])
+
+
+@override_settings(
+    FEED_PULL_THRESHOLD=3, FEED_PUSH_THRESHOLD=1, FEED_PUSH_WORKERS=0
+)
+class FeedThresholdTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.fans = [
+            User.objects.create_user(username=f'fan_{num}')
+            for num in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, fans):
+        for fan in fans:
+            Follow.objects.create(user=fan, author=FeedThresholdTest.author)
+
+    def publish(self):
+        return Post.objects.create(
+            text='Пост', author=FeedThresholdTest.author
+        )
+
+    def pushed(self, post):
+        return set(
+            Timeline.objects.filter(post=post).values_list('user', flat=True)
+        )
+
+    def test_bulk_unfollow_skips_threshold(self):
+        """Массовая отписка, перескочившая оба порога, раскладывает
+        посты автора оставшемуся подписчику."""
+        fans = FeedThresholdTest.fans
+        self.follow(fans)
+        post = self.publish()
+        self.assertEqual(self.pushed(post), set())
+
+        with mock.patch.object(transaction, 'on_commit', run_on_commit):
+            Follow.objects.filter(user__in=fans[1:]).delete()
+
+        self.assertEqual(self.pushed(post), {fans[0].pk})
+        self.assertFalse(
+            AuthorStats.objects.get(author=FeedThresholdTest.author).pulled
+        )
+
+    def test_pulled_author_between_thresholds(self):
+        """Автор, опустившийся между порогами, читается напрямую и не
+        раскладывается по лентам."""
+        fans = FeedThresholdTest.fans
+        self.follow(fans[:4])
+        post = self.publish()
+
+        with mock.patch.object(transaction, 'on_commit') as on_commit:
+            Follow.objects.filter(user__in=fans[2:4]).delete()
+
+        on_commit.assert_not_called()
+        self.assertEqual(self.pushed(post), set())
+        client = Client()
+        client.force_login(fans[0])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_pushed_author_between_thresholds(self):
+        """Автор, поднявшийся между порогами, продолжает раскладываться
+        по лентам."""
+        fans = FeedThresholdTest.fans
+        self.follow(fans[:3])
+
+        post = self.publish()
+
+        self.assertEqual(self.pushed(post), {fan.pk for fan in fans[:3]})
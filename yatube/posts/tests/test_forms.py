@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -17,7 +18,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostsFormsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -117,7 +118,8 @@ class PostsFormsTest(TestCase):
         post = Post.objects.first()
         self.assertEqual(post.text, post_data['text'])
         self.assertEqual(post.group.pk, post_data['group'])
-        self.assertEqual(post.image, 'posts/small.gif')
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(post.image, f'posts/{digest[:2]}/{digest}.gif')
 
         urls_pages = [
             PostsFormsTest.url_index,
@@ -130,7 +132,9 @@ class PostsFormsTest(TestCase):
             with self.subTest(url=url):
                 response_two = self.authorized_client.get(url)
                 self.assertEqual(response_two.status_code, HTTPStatus.OK)
-                self.assertEqual(post.image, 'posts/small.gif')
+                self.assertEqual(
+                    post.image, f'posts/{digest[:2]}/{digest}.gif'
+                )
 
     def test_post_edit(self):
         """Валидная форма редактирует запись."""
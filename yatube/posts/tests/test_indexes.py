@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase, skipUnlessDBFeature
+
+from ..feeds import follow_feed, timeline_ordering
+from ..models import Comment, Follow, Group, Post
+from ..utils import CursorPaginator, feed_ordering, number
+
+User = get_user_model()
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class FeedIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Test_title',
+            description='Test_description',
+            slug='Group',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def seek_page(self, queryset, ordering=feed_ordering):
+        """Запрос второй страницы курсорного пагинатора."""
+        paginator = CursorPaginator(queryset, number, ordering)
+        values = [
+            getattr(FeedIndexesTest.post, name.lstrip('-'))
+            for name in ordering
+        ]
+        return paginator.object_list.filter(
+            paginator._seek(values, True)
+        )[:number + 1]
+
+    def test_index_feed(self):
+        """Главная лента идет по индексу (-pub_date, -id)."""
+        self.assertUsesIndex(
+            self.seek_page(Post.objects.all()), 'post_pub_date_idx'
+        )
+
+    def test_group_feed(self):
+        """Лента группы идет по индексу (group, -pub_date, -id)."""
+        self.assertUsesIndex(
+            self.seek_page(Post.objects.filter(group=FeedIndexesTest.group)),
+            'post_group_pub_date_idx'
+        )
+
+    def test_profile_feed(self):
+        """Лента автора идет по индексу (author, -pub_date, -id)."""
+        self.assertUsesIndex(
+            self.seek_page(FeedIndexesTest.user.post.all()),
+            'post_author_pub_date_idx'
+        )
+
+    def test_follow_feed(self):
+        """Лента подписок идет по индексу материализованной ленты."""
+        timeline = follow_feed(FeedIndexesTest.user)[0]
+        self.assertUsesIndex(
+            CursorPaginator(timeline, number, timeline_ordering)
+            .object_list[:number + 1],
+            'timeline_user_pub_date_idx'
+        )
+
+    def test_comments(self):
+        """Комментарии поста читаются по индексу (post, created)."""
+        self.assertUsesIndex(
+            Comment.objects.filter(post=FeedIndexesTest.post)
+            .order_by('created'),
+            'comment_post_created_idx'
+        )
+
+
+class FollowConstraintTest(TestCase):
+    def test_unique_following(self):
+        """Повторная подписка на автора запрещена на уровне БД."""
+        user = User.objects.create_user(username='user')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
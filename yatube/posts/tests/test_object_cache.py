@@ -0,0 +1,158 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import object_cache
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Test_title', description='Test_description', slug='group'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        object_cache.stats.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ObjectCacheTest.user)
+
+    def test_read_through(self):
+        """Второе чтение по pk, slug и имени не ходит в базу и
+        считается попаданием."""
+        lookups = (
+            (Post, {'pk': ObjectCacheTest.post.pk}),
+            (Group, {'slug': 'group'}),
+            (User, {'username': 'test_user'}),
+        )
+        for model, lookup in lookups:
+            object_cache.get_or_404(model, **lookup)
+
+        with self.assertNumQueries(0):
+            for model, lookup in lookups:
+                object_cache.get_or_404(model, **lookup)
+
+        self.assertEqual(
+            object_cache.snapshot()['posts.group'], {'hits': 1, 'misses': 1}
+        )
+
+    def test_user_columns(self):
+        """Пользователь кэшируется без хэша пароля и прав."""
+        user = User.objects.create_user(username='secret', password='pw')
+
+        object_cache.get_or_404(User, username='secret')
+
+        cached = cache.get(f'objects:{User._meta.label_lower}:pk:{user.pk}')
+        self.assertEqual(cached.username, 'secret')
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('is_superuser', cached.__dict__)
+
+    def test_get_many(self):
+        """Недостающие в кэше объекты читаются одним запросом."""
+        other = Post.objects.create(text='Другой', author=self.user)
+        object_cache.get_many(Post, [ObjectCacheTest.post.pk])
+
+        with self.assertNumQueries(1):
+            found = object_cache.get_many(
+                Post, [ObjectCacheTest.post.pk, other.pk, 0]
+            )
+
+        self.assertEqual(set(found), {ObjectCacheTest.post.pk, other.pk})
+        self.assertEqual(
+            object_cache.snapshot()['posts.post'], {'hits': 1, 'misses': 3}
+        )
+
+    def test_missing(self):
+        """Отсутствие кэшируется, а созданный объект его сбрасывает."""
+        for _ in range(2):
+            with self.assertRaises(Http404):
+                object_cache.get_or_404(Group, slug='new')
+        self.assertEqual(object_cache.stats['posts.group']['hits'], 1)
+
+        Group.objects.create(title='Новая', description='Новая', slug='new')
+
+        self.assertEqual(
+            object_cache.get_or_404(Group, slug='new').title, 'Новая'
+        )
+
+    def test_rename(self):
+        """После смены slug старый адрес группы отвечает 404."""
+        object_cache.get_or_404(Group, slug='group')
+        group = Group.objects.get(slug='group')
+        group.slug = 'renamed'
+        group.save()
+
+        with self.assertRaises(Http404):
+            object_cache.get_or_404(Group, slug='group')
+        self.assertEqual(
+            object_cache.get_or_404(Group, slug='renamed').pk, group.pk
+        )
+
+    def test_counters_invalidate(self):
+        """Счетчики, сдвинутые UPDATE, не читаются из старой копии."""
+        url = reverse('posts:post_detail', args=[ObjectCacheTest.post.pk])
+        self.authorized_client.get(url)
+
+        Comment.objects.create(
+            post=ObjectCacheTest.post, author=self.user, text='Ок'
+        )
+
+        self.assertEqual(
+            self.authorized_client.get(url).context['post'].comment_count, 1
+        )
+
+    def test_views(self):
+        """Страницы поста, группы и профиля берут строки из кэша,
+        несуществующий автор - 404."""
+        urls = (
+            reverse('posts:post_detail', args=[ObjectCacheTest.post.pk]),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:profile', args=['test_user']),
+        )
+        for url in urls:
+            self.client.get(url)
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.OK
+                )
+        post = self.client.get(urls[0]).context['post']
+        self.assertEqual(post.author.username, 'test_user')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(
+            object_cache.snapshot()['posts.post'], {'hits': 2, 'misses': 1}
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:profile', args=['missing'])
+            ).status_code,
+            HTTPStatus.NOT_FOUND
+        )
+
+    def test_edit_keeps_counters(self):
+        """Правка сохраняет свежие счетчики, а не копию из кэша."""
+        url = reverse('posts:post_edit', args=[ObjectCacheTest.post.pk])
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=ObjectCacheTest.post.pk).update(
+            comment_count=5
+        )
+
+        self.authorized_client.post(url, data={'text': 'Правка'})
+
+        post = Post.objects.get(pk=ObjectCacheTest.post.pk)
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comment_count, 5)
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchPaginator, filter_posts
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.cats = Post.objects.create(
+            text='Кошки любят спать на солнце', author=cls.user
+        )
+        cls.cat = Post.objects.create(
+            text='Кошка кошке кошку: про кошек и кошками', author=cls.user
+        )
+        cls.dog = Post.objects.create(
+            text='Собака спала во дворе', author=cls.user
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, per_page=10):
+        return list(SearchPaginator(query, per_page).page())
+
+    def test_stem(self):
+        """Формы слова сводятся к одной основе."""
+        for words in (
+            ('кошка', 'кошки', 'кошкам', 'кошками'),
+            ('спал', 'спала', 'спали'),
+            ('красивый', 'красивая', 'красивейший'),
+        ):
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_ranked(self):
+        """Находятся другие формы слова, пост с большим числом
+        совпадений выше."""
+        self.assertEqual(
+            self.found('кошкой'), [SearchTest.cat, SearchTest.cats]
+        )
+        self.assertEqual(self.found('спали собаки'), [SearchTest.dog])
+        self.assertEqual(self.found('жираф'), [])
+
+    def test_keyset(self):
+        """Страницы выдачи листаются курсором по рангу."""
+        paginator = SearchPaginator('кошки', 1)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        back = paginator.page(second.previous_cursor)
+
+        self.assertEqual(list(first), [SearchTest.cat])
+        self.assertEqual(list(second), [SearchTest.cats])
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(back), [SearchTest.cat])
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при правке и удалении поста и
+        пересобирается командой."""
+        post = Post.objects.create(text='Жираф', author=SearchTest.user)
+        self.assertEqual(self.found('жирафы'), [post])
+        post.text = 'Слон'
+        post.save()
+        self.assertEqual(self.found('жираф'), [])
+        self.assertEqual(self.found('слоны'), [post])
+        post.delete()
+        self.assertEqual(self.found('слон'), [])
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM posts_post_fts')
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.found('собаки'), [SearchTest.dog])
+
+    def test_view_and_admin(self):
+        """Страница поиска и поиск в админке идут через индекс."""
+        response = self.client.get(reverse('posts:search'), {'q': 'собаки'})
+        self.assertEqual(list(response.context['page_obj']), [SearchTest.dog])
+        self.assertContains(response, 'Собака спала')
+
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'кошку')),
+            [SearchTest.cat, SearchTest.cats]
+        )
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..blobs import collect_garbage
+from ..models import MediaBlob, Post
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+
+
+def other_gif():
+    buffer = BytesIO()
+    Image.new('RGB', (3, 3), (10, 200, 10)).save(buffer, 'GIF')
+    return buffer.getvalue()
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class StorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.clear()
+        cache.clear()
+
+    def create(self, content=SMALL_GIF, name='small.GIF'):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=StorageTest.user,
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def refs(self, name):
+        return MediaBlob.objects.get(name=name).ref_count
+
+    def test_same_content_stored_once(self):
+        """Одинаковые загрузки получают имя по хэшу и один файл."""
+        first = self.create()
+        second = self.create(name='copy.gif')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+
+        self.assertEqual(
+            first.image.name, f'posts/{digest[:2]}/{digest}.gif'
+        )
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.path)]
+        )
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_ref_count_follows_posts(self):
+        """Счетчик ссылок меняется при смене картинки и удалении поста."""
+        first = self.create()
+        second = self.create()
+        name = first.image.name
+
+        second.image = SimpleUploadedFile('other.gif', other_gif())
+        second.save()
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(self.refs(second.image.name), 1)
+
+        first.delete()
+        self.assertEqual(self.refs(name), 0)
+
+    def test_reuses_thumbnails(self):
+        """Второй пост с тем же файлом берет готовые миниатюры и
+        метаданные без повторной генерации."""
+        first = self.create()
+        thumbnails.schedule(first)
+        second = self.create()
+
+        with mock.patch.object(thumbnails, '_render') as render:
+            thumbnails.schedule(second)
+
+        render.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image_width, 2)
+        self.assertEqual(second.image_color, first.image_color)
+
+    def test_collect_garbage(self):
+        """Сборщик удаляет давно ненужные файлы, брошенные загрузки и
+        миниатюры без записи в kvstore, но не трогает живые файлы."""
+        kept = self.create()
+        thumbnails.schedule(kept)
+        released = self.create(other_gif())
+        thumbnails.schedule(released)
+        released_name = released.image.name
+        released.delete()
+        untracked = default_storage.save(
+            'posts/ab/abandoned.gif', ContentFile(SMALL_GIF)
+        )
+        orphan = default_storage.save(
+            'cache/ab/cd/orphan.jpg', ContentFile(b'jpeg')
+        )
+
+        self.assertEqual(
+            collect_garbage(grace=timedelta(days=1)),
+            {'blobs': 0, 'untracked': 0, 'thumbnails': 0}
+        )
+        stdout = StringIO()
+        call_command('gc_media', grace_hours=0, batch_size=1, stdout=stdout)
+
+        self.assertIn('blobs: 1', stdout.getvalue())
+        self.assertIn('untracked: 1', stdout.getvalue())
+        self.assertIn('thumbnails: 1', stdout.getvalue())
+        for name in (released_name, untracked, orphan):
+            self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=released_name))
+        self.assertTrue(default_storage.exists(kept.image.name))
+        geometry, options = thumbnails.geometries()[0]
+        self.assertIsNotNone(
+            thumbnails.backend.cached(kept.image.name, geometry, options)
+        )
+
+    def test_reupload_survives_collection(self):
+        """Повторная загрузка давно освобожденного файла защищает его
+        от сборщика, пока пост не сохранен."""
+        released = self.create()
+        name = released.image.name
+        released.delete()
+        past = timezone.now() - timedelta(days=3)
+        MediaBlob.objects.filter(name=name).update(changed=past)
+        os.utime(default_storage.path(name), (past.timestamp(),) * 2)
+        storage = Post._meta.get_field('image').storage
+
+        self.assertEqual(
+            storage.save('posts/small.gif', ContentFile(SMALL_GIF)), name
+        )
+
+        self.assertEqual(
+            collect_garbage(grace=timedelta(days=1))['blobs'], 0
+        )
+        self.assertTrue(default_storage.exists(name))
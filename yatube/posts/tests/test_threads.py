@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..bulk import delete_comments
+from ..models import Comment, Post
+from ..threads import attach_replies, reply_parent, root_path, thread_page
+
+User = get_user_model()
+
+
+class ThreadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.root = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Корень'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThreadsTest.user)
+
+    def reply(self, parent, text='Ответ'):
+        return Comment.objects.create(
+            post=ThreadsTest.post, author=ThreadsTest.user, text=text,
+            parent=parent,
+        )
+
+    def test_add_reply(self):
+        """Ответ через форму получает родителя, путь и глубину,
+        счетчик ответов корня растет."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[ThreadsTest.post.pk]),
+            data={'text': 'Ответ', 'parent': ThreadsTest.root.pk},
+        )
+
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, ThreadsTest.root)
+        self.assertEqual(
+            reply.path, f'{ThreadsTest.root.path}.{reply.pk:010d}'
+        )
+        self.assertEqual(reply.depth, 1)
+        ThreadsTest.root.refresh_from_db()
+        self.assertEqual(ThreadsTest.root.reply_count, 1)
+
+    def test_reply_counts(self):
+        """Ответ считается у всех предков и снимается при удалении."""
+        child = self.reply(ThreadsTest.root)
+        grandchild = self.reply(child)
+
+        self.assertEqual(
+            Comment.objects.get(pk=ThreadsTest.root.pk).reply_count, 2
+        )
+        self.assertEqual(Comment.objects.get(pk=child.pk).reply_count, 1)
+        grandchild.delete()
+        self.assertEqual(
+            Comment.objects.get(pk=ThreadsTest.root.pk).reply_count, 1
+        )
+
+    def test_depth_limit(self):
+        """Ответ глубже max_depth становится соседом родителя."""
+        parent = ThreadsTest.root
+        for _ in range(Comment.max_depth):
+            parent = self.reply(parent)
+
+        attached = reply_parent(ThreadsTest.post.pk, parent.pk)
+
+        self.assertEqual(attached.pk, parent.parent_id)
+        self.assertIsNone(reply_parent(ThreadsTest.post.pk, 'x'))
+        self.assertIsNone(reply_parent(0, parent.pk))
+
+    def test_thread_in_one_query(self):
+        """Ветки страницы корней читаются одним запросом в порядке
+        обхода дерева."""
+        child = self.reply(ThreadsTest.root, 'Первый')
+        self.reply(child, 'Вложенный')
+        self.reply(ThreadsTest.root, 'Второй')
+        other = Comment.objects.create(
+            post=ThreadsTest.post, author=ThreadsTest.user, text='Другой'
+        )
+        self.reply(other, 'Ответ другому')
+        page = thread_page(ThreadsTest.post.pk, 'old', None)
+        roots = list(page.object_list)
+
+        with self.assertNumQueries(1):
+            attach_replies(ThreadsTest.post.pk, roots)
+
+        self.assertEqual(
+            [reply.text for reply in roots[0].thread],
+            ['Первый', 'Вложенный', 'Второй']
+        )
+        self.assertEqual(
+            [reply.text for reply in roots[1].thread], ['Ответ другому']
+        )
+        self.assertIsNone(roots[0].more_after)
+
+    def test_more_replies(self):
+        """Ветка сверх лимита дочитывается фрагментом по курсору."""
+        for num in range(5):
+            self.reply(ThreadsTest.root, f'Ответ №{num}.')
+        roots = list(thread_page(ThreadsTest.post.pk, 'old', None))
+        attach_replies(ThreadsTest.post.pk, roots, limit=2)
+        root = roots[0]
+        url = reverse(
+            'posts:comment_replies', args=[ThreadsTest.post.pk, root.pk]
+        )
+
+        response = self.client.get(url, {'after': root.more_after})
+
+        self.assertEqual(
+            [reply.text for reply in response.context['replies']],
+            [f'Ответ №{num}.' for num in range(2, 5)]
+        )
+        self.assertIsNone(response.context['more_after'])
+        self.assertNotContains(response, '<html')
+
+    def test_reply_link(self):
+        """?reply= добавляет родителя в форму комментария."""
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[ThreadsTest.post.pk]),
+            {'reply': ThreadsTest.root.pk},
+        )
+
+        self.assertEqual(response.context['reply_to'], ThreadsTest.root)
+        self.assertContains(
+            response,
+            f'name="parent" value="{ThreadsTest.root.pk}"'
+        )
+
+    def test_delete_branch(self):
+        """Массовое удаление уносит ветку целиком и пересчитывает
+        счетчики предков и поста."""
+        child = self.reply(ThreadsTest.root)
+        grandchild = self.reply(child)
+        self.reply(grandchild)
+        self.reply(ThreadsTest.root, 'Останется')
+
+        delete_comments(Comment.objects.filter(pk=child.pk))
+
+        root = Comment.objects.get(pk=ThreadsTest.root.pk)
+        self.assertEqual(root.reply_count, 1)
+        self.assertEqual(
+            list(root.replies.values_list('text', flat=True)), ['Останется']
+        )
+        self.assertEqual(
+            Post.objects.get(pk=ThreadsTest.post.pk).comment_count, 2
+        )
+
+    def test_root_path(self):
+        """Путь корня для старых комментариев - id с нулями."""
+        Comment.objects.filter(pk=ThreadsTest.root.pk).update(path='')
+
+        Comment.objects.filter(path='').update(path=root_path())
+
+        self.assertEqual(
+            Comment.objects.get(pk=ThreadsTest.root.pk).path,
+            f'{ThreadsTest.root.pk:010d}'
+        )
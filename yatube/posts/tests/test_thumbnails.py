@@ -0,0 +1,213 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        _, _, cls.geometry, cls.options = next(
+            variant for variant in thumbnails.variants('feed')
+            if variant[:2] == ('JPEG', 960)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.clear()
+        cache.clear()
+        self.client = Client()
+
+    def cached(self):
+        return thumbnails.backend.cached(
+            ThumbnailsTest.post.image.name,
+            ThumbnailsTest.geometry,
+            ThumbnailsTest.options,
+        )
+
+    @override_settings(POST_THUMBNAIL_WORKERS=2)
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а задача ставится
+        в пул один раз."""
+        with mock.patch.object(thumbnails, '_pool') as pool:
+            for url in (
+                reverse('posts:index'),
+                reverse('posts:post_detail', args=[ThumbnailsTest.post.pk]),
+            ):
+                response = self.client.get(url)
+                self.assertContains(response, 'aspect-ratio')
+                self.assertNotContains(response, '<img class="card-img')
+
+        pool.return_value.submit.assert_called_once()
+        self.assertIsNone(self.cached())
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_picture(self):
+        """Готовые варианты выводятся через <picture> с srcset:
+        WebP в <source>, JPEG запасным в <img>."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[ThumbnailsTest.post.pk])
+        )
+
+        thumbnail = self.cached()
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(thumbnail.size, [960, 339])
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertContains(response, f'{thumbnail.url} 960w')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, '.webp 1440w')
+        post = Post.objects.get(pk=ThumbnailsTest.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertRegex(post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertContains(response, post.image_placeholder)
+
+    @override_settings(POST_THUMBNAIL_WORKERS=1)
+    def test_process_pool(self):
+        """Дочерний процесс создает файлы, а в kvstore их записывает
+        первый запрос, которому они понадобились."""
+        name = ThumbnailsTest.post.image.name
+        future = thumbnails._pool().submit(
+            thumbnails._render, name, thumbnails.geometries()
+        )
+        size, _, meta = future.result(timeout=60)
+        thumbnails._finish(name, [], future)
+        self.assertEqual(tuple(size), (2, 1))
+        self.assertEqual(meta['image_width'], 2)
+        self.assertIsNone(self.cached())
+
+        thumbnail = thumbnails.ready_thumbnail(
+            Post.objects.get(pk=ThumbnailsTest.post.pk),
+            ThumbnailsTest.geometry,
+            **ThumbnailsTest.options
+        )
+
+        self.assertEqual(thumbnail.size, [960, 339])
+        self.assertEqual(self.cached().size, [960, 339])
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_prefetch(self):
+        """Миниатюры страницы находятся одним запросом, повторное
+        чтение идет из LRU процесса без запросов."""
+        posts = [Post.objects.get(pk=ThumbnailsTest.post.pk)] + [
+            Post.objects.create(
+                text=f'Пост {num}',
+                author=ThumbnailsTest.user,
+                image=SimpleUploadedFile(
+                    name=f'small{num}.gif', content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            )
+            for num in range(2)
+        ]
+        for post in posts:
+            thumbnails.schedule(post)
+        default.kvstore._local.clear()
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch_rendition(posts, 'feed')
+        self.assertEqual(len(queries), 1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            for post in Post.objects.filter(pk__in=[p.pk for p in posts]):
+                self.assertIsNotNone(thumbnails.ready_thumbnail(
+                    post, ThumbnailsTest.geometry, **ThumbnailsTest.options
+                ))
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_forget(self):
+        """Смена картинки убирает записи о старых миниатюрах."""
+        thumbnails.schedule(ThumbnailsTest.post)
+        self.assertIsNotNone(self.cached())
+
+        thumbnails.forget(ThumbnailsTest.post.image.name)
+
+        self.assertIsNone(self.cached())
+
+    def test_bench_images(self):
+        """bench_images сравнивает байты старой миниатюры и srcset."""
+        output = StringIO()
+        call_command(
+            'bench_images', '--viewports=360x1,1920x2', pages=1,
+            stdout=output
+        )
+        report = json.loads(output.getvalue())
+
+        self.assertEqual(report['images'], 1)
+        self.assertGreater(report['before_bytes_per_page'], 0)
+        self.assertEqual(set(report['after']), {'360x1', '1920x2'})
+        self.assertLess(
+            report['after']['360x1']['JPEG']['bytes_per_page'],
+            report['before_bytes_per_page']
+        )
+
+    def test_backfill_image_meta(self):
+        """Команда заполняет размеры и превью пулом процессов, а смена
+        картинки их сбрасывает."""
+        Post.objects.update(image_width=None, image_placeholder='')
+
+        call_command(
+            'backfill_image_meta', workers=1, batch_size=1, stdout=StringIO()
+        )
+
+        post = Post.objects.get(pk=ThumbnailsTest.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder)
+        self.assertTrue(post.image_color)
+
+        post.image = SimpleUploadedFile(
+            name='other.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
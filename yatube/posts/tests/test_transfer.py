@@ -0,0 +1,191 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..counters import author_post_count
+from ..models import Comment, Follow, Group, Post, Timeline
+from ..transfer import Checkpoint, Importer, peak_memory
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_user', password='secret', is_staff=True
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test_title', description='Test_description', slug='group'
+        )
+        cls.post = Post.objects.create(
+            text='Пост в группе', author=cls.user, group=cls.group
+        )
+        Post.objects.create(text='Пост без группы', author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, name='dump.jsonl.gz'):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, batch_size=1, stdout=StringIO())
+        return path
+
+    def wipe(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка загружается в пустую базу и совпадает с исходной."""
+        path = self.export()
+        call_command('import_posts', path, verify=True, stdout=StringIO())
+        self.wipe()
+
+        output = StringIO()
+        call_command('import_posts', path, batch_size=1, stdout=output)
+
+        self.assertIn('записей/с', output.getvalue())
+        call_command('import_posts', path, verify=True, stdout=StringIO())
+        post = Post.objects.get(text='Пост в группе')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.comments_post.get().author.username, 'reader')
+        self.assertEqual(post.pub_date, TransferTest.post.pub_date)
+        self.assertEqual(author_post_count(post.author), 2)
+        self.assertFalse(post.author.has_usable_password())
+        self.assertFalse(post.author.is_staff)
+        self.assertEqual(
+            post.author.date_joined, TransferTest.user.date_joined
+        )
+        self.assertEqual(
+            Timeline.objects.filter(user__username='reader').count(), 2
+        )
+
+    def test_credentials(self):
+        """Хэш пароля и права переносятся только с --with-credentials,
+        а без флага не берутся даже из файла."""
+        path = os.path.join(self.directory, 'dump.jsonl')
+        call_command(
+            'export_posts', path, with_credentials=True, stdout=StringIO()
+        )
+        for credentials in (True, False):
+            with self.subTest(credentials=credentials):
+                self.wipe()
+
+                call_command(
+                    'import_posts', path, with_credentials=credentials,
+                    stdout=StringIO()
+                )
+
+                user = User.objects.get(username='test_user')
+                self.assertEqual(user.check_password('secret'), credentials)
+                self.assertEqual(user.is_staff, credentials)
+                call_command(
+                    'import_posts', path, verify=True, stdout=StringIO()
+                )
+
+    def test_verify_mismatch(self):
+        """Сверка находит расхождение с базой."""
+        path = self.export('dump.jsonl')
+        Post.objects.create(text='Новый пост', author=TransferTest.user)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_posts', path, verify=True, stdout=StringIO()
+            )
+
+    def test_resume(self):
+        """Прерванная загрузка продолжается с отметки без дублей."""
+        path = self.export()
+        checkpoint = os.path.join(self.directory, 'import.checkpoint')
+        self.wipe()
+
+        with mock.patch.object(
+            Importer, 'load_comments', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_posts', path, batch_size=1,
+                    checkpoint=checkpoint, stdout=StringIO()
+                )
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(Comment.objects.exists())
+
+        call_command(
+            'import_posts', path, batch_size=1, checkpoint=checkpoint,
+            stdout=StringIO()
+        )
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            Comment.objects.get().post.text, 'Пост в группе'
+        )
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_resume_after_commit(self):
+        """Пачка, закоммиченная до сохранения отметки, при
+        продолжении не загружается второй раз."""
+        path = self.export()
+        checkpoint = os.path.join(self.directory, 'import.checkpoint')
+        self.wipe()
+        save = Checkpoint.save
+
+        def crash_on_posts(checkpoint, line, new_ids):
+            if new_ids and new_ids[0][0] == 'post':
+                raise RuntimeError
+            save(checkpoint, line, new_ids)
+
+        with mock.patch.object(Checkpoint, 'save', crash_on_posts):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_posts', path, batch_size=1,
+                    checkpoint=checkpoint, stdout=StringIO()
+                )
+        self.assertEqual(Post.objects.count(), 1)
+
+        call_command(
+            'import_posts', path, batch_size=1, checkpoint=checkpoint,
+            stdout=StringIO()
+        )
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_peak_memory(self):
+        """ru_maxrss в байтах на macOS и в килобайтах на Linux."""
+        usage = mock.Mock(ru_maxrss=512 * 1024 ** 2)
+        with mock.patch('resource.getrusage', return_value=usage):
+            with mock.patch('sys.platform', 'darwin'):
+                self.assertEqual(peak_memory(), 512)
+            with mock.patch('sys.platform', 'linux'):
+                self.assertEqual(peak_memory(), 512 * 1024)
+
+    def test_threads(self):
+        """Ответы загружаются в ту же ветку с новыми путями."""
+        root = TransferTest.post.comments_post.get()
+        Comment.objects.create(
+            post=TransferTest.post, author=TransferTest.user, text='Ответ',
+            parent=root,
+        )
+        path = self.export()
+        self.wipe()
+
+        call_command('import_posts', path, batch_size=1, stdout=StringIO())
+
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent.text, 'Ок')
+        self.assertEqual(reply.path, f'{reply.parent.path}.{reply.pk:010d}')
+        self.assertEqual(reply.parent.reply_count, 1)
+        call_command('import_posts', path, verify=True, stdout=StringIO())
@@ -0,0 +1,124 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import StopUpload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+from ..uploads import LimitedUploadHandler
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(image_format, size=(4, 2), **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class UploadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(UploadsTest.user)
+
+    def create(self, name, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def test_accepts_image(self):
+        """Картинка в допустимых пределах сохраняется."""
+        response = self.create('small.png', image_bytes('PNG'))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            Post.objects.get().image.name.startswith('posts/')
+        )
+
+    def test_rejects_by_header(self):
+        """Размер файла, число пикселей и формат проверяются до
+        сохранения поста."""
+        cases = (
+            ('big.jpg', image_bytes('JPEG'), {'POST_IMAGE_MAX_BYTES': 64},
+             'file_too_large'),
+            ('big.png', image_bytes('PNG', (64, 64)),
+             {'POST_IMAGE_MAX_BYTES': 64}, 'file_too_large'),
+            ('wide.png', image_bytes('PNG'), {'POST_IMAGE_MAX_PIXELS': 7},
+             'too_many_pixels'),
+            ('image.bmp', image_bytes('BMP'), {}, 'invalid_format'),
+        )
+        for name, content, limits, code in cases:
+            with self.subTest(name=name), self.settings(**limits):
+                response = self.create(name, content)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response.context['form'].has_error('image', code)
+                )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=10)
+    def test_handler_stops_reading(self):
+        """На куске за лимитом обработчик останавливает разбор и
+        оставляет заготовку с прочитанным размером."""
+        handler = LimitedUploadHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', 100)
+        handler.receive_data_chunk(b'x' * 8, 0)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'x' * 8, 8)
+
+        self.assertEqual(handler.oversized['image'].size, 16)
+
+    def test_sanitize(self):
+        """EXIF снимается, поворот применяется, JPEG становится
+        progressive."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        upload = ContentFile(
+            image_bytes('JPEG', exif=exif.tobytes()), name='rotated.jpg'
+        )
+
+        clean = thumbnails.sanitize(upload)
+
+        self.assertIsNone(thumbnails.sanitize(clean))
+        image = Image.open(clean)
+        self.assertNotIn('exif', image.info)
+        self.assertTrue(image.info.get('progressive'))
+        self.assertEqual(image.size, (2, 4))
+
+    def test_stored_sanitized(self):
+        """Под именем из хэша сохраняется уже очищенный файл."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        self.create('photo.jpg', image_bytes('JPEG', exif=exif.tobytes()))
+
+        name = Post.objects.get().image.name
+        with default_storage.open(name) as source:
+            content = source.read()
+        self.assertNotIn('exif', Image.open(BytesIO(content)).info)
+        self.assertIn(hashlib.sha256(content).hexdigest(), name)
@@ -0,0 +1,223 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Page, Paginator
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..utils import (
+    CursorPaginator, EstimatedPaginator, _store_count, page_window
+)
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create(
+            Post(text=f'test text {num}', author=cls.user)
+            for num in range(25)
+        )
+        cls.url_index = reverse('posts:index')
+
+    def setUp(self):
+        self.client = Client()
+
+    def collect_pages(self):
+        """Проходит ленту по курсорам до конца."""
+        response = self.client.get(CursorPaginatorTest.url_index)
+        pages = [response.context['page_obj']]
+        while pages[-1].next_cursor:
+            response = self.client.get(
+                CursorPaginatorTest.url_index,
+                {'cursor': pages[-1].next_cursor}
+            )
+            pages.append(response.context['page_obj'])
+        return pages
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры проходят ленту без пропусков и повторов."""
+        pages = self.collect_pages()
+        ids = [post.pk for page in pages for post in page]
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )
+        )
+
+        self.assertEqual(ids, expected)
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursor(self):
+        """Курсор назад возвращает предыдущую страницу."""
+        first, second, _ = self.collect_pages()
+        response = self.client.get(
+            CursorPaginatorTest.url_index,
+            {'cursor': second.previous_cursor}
+        )
+        page = response.context['page_obj']
+
+        self.assertEqual(list(page), list(first))
+        self.assertEqual(page.number, 1)
+        self.assertFalse(page.has_previous())
+
+    def test_page_type(self):
+        """Страница по курсору остается обычным Page."""
+        page = CursorPaginator(Post.objects.all(), 10).page()
+
+        self.assertIs(type(page), Page)
+        self.assertIsInstance(page.paginator, Paginator)
+
+    def test_first_page_without_count(self):
+        """Первая страница собирается одним запросом без COUNT(*)."""
+        with self.assertNumQueries(1) as queries:
+            page = CursorPaginator(Post.objects.all(), 10).page()
+            list(page)
+        sql = queries.captured_queries[0]['sql']
+
+        self.assertNotIn('COUNT', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertIn('LIMIT 11', sql)
+
+    def test_bad_cursor(self):
+        """Поддельный курсор открывает первую страницу."""
+        response = self.client.get(
+            CursorPaginatorTest.url_index, {'cursor': 'forged'}
+        )
+
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_page_number_fallback(self):
+        """Параметр ?page=N продолжает работать."""
+        response = self.client.get(
+            CursorPaginatorTest.url_index, {'page': 3}
+        )
+
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+
+class PageWindowTest(SimpleTestCase):
+    def test_window(self):
+        """Окно вокруг текущей страницы, первая и последняя, пропуски."""
+        cases = (
+            ((1, 1), [1]),
+            ((1, 5), [1, 2, 3, 4, 5]),
+            ((4, 7), [1, 2, 3, 4, 5, 6, 7]),
+            ((1, 5000), [1, 2, 3, None, 5000]),
+            ((2500, 5000), [1, None, *range(2498, 2503), None, 5000]),
+            ((5000, 5000), [1, None, 4998, 4999, 5000]),
+        )
+        for (current, pages), expected in cases:
+            with self.subTest(current=current, pages=pages):
+                self.assertEqual(page_window(current, pages), expected)
+
+    def test_render(self):
+        """Навигация по 5000 страниц рендерит только окно."""
+        page = Paginator(range(50000), 10).page(2500)
+        html = render_to_string(
+            'posts/includes/paginator.html', {'page_obj': page}
+        )
+
+        self.assertEqual(html.count('class="page-item'), 11)
+        for number in (1, 2499, 2501, 5000):
+            self.assertIn(f'?page={number}"', html)
+        self.assertNotIn('?page=2000"', html)
+
+
+@override_settings(COUNT_ESTIMATE_THRESHOLD=5, COUNT_ESTIMATE_WORKERS=0)
+class EstimatedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create(
+            Post(text=f'test text {num}', author=cls.user)
+            for num in range(25)
+        )
+        # Дыра в первичном ключе: оценка по нему завышена.
+        pks = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        Post.objects.filter(pk__in=pks[5:17]).delete()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def tearDown(self):
+        # Число строк лежит под ключом той же выборки, что у главной.
+        cache.clear()
+
+    def get_page(self, page):
+        response = self.client.get(reverse('posts:index'), {'page': page})
+        return response, response.context['page_obj']
+
+    def test_estimate_above_threshold(self):
+        """Выше порога число страниц приблизительное, а точное
+        пересчитывается и берется из кэша."""
+        response, page = self.get_page(1)
+
+        self.assertTrue(page.paginator.estimated)
+        self.assertEqual(page.paginator.num_pages, 3)
+        self.assertContains(response, 'около')
+
+        with self.assertNumQueries(1):
+            paginator = EstimatedPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.count, 13)
+            list(paginator.page(1))
+
+    def test_exact_below_threshold(self):
+        """До порога число строк точное."""
+        paginator = EstimatedPaginator(Post.objects.all()[:0], 10)
+        self.assertFalse(paginator.estimated)
+        paginator = EstimatedPaginator(
+            Post.objects.filter(text='test text 1'), 10
+        )
+
+        self.assertEqual(paginator.count, 1)
+        self.assertFalse(paginator.estimated)
+
+    def test_out_of_range(self):
+        """Страница за концом данных ведет на настоящую последнюю."""
+        for number in (3, 999):
+            with self.subTest(page=number):
+                cache.clear()
+                response, page = self.get_page(number)
+
+                self.assertEqual(page.number, 2)
+                self.assertEqual(len(page), 3)
+                self.assertFalse(page.has_next())
+                self.assertNotContains(response, 'около')
+
+    def test_stale_low_count(self):
+        """Заниженное число из кэша не обрезает страницу и не
+        записывается обратно как точное."""
+        _store_count(Post.objects.all(), 6)
+
+        page = EstimatedPaginator(Post.objects.all(), 10).page(1)
+
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        paginator = EstimatedPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 13)
+        self.assertEqual(len(paginator.page(2)), 3)
+
+    def test_stale_low_count_deep_page(self):
+        """Страница за последней по заниженному числу открывается,
+        а не заменяется последней по оценке."""
+        posts = Post.objects.filter(author=EstimatedPaginatorTest.user)
+        _store_count(posts, 6)
+
+        page = EstimatedPaginator(posts, 5).get_page(3)
+
+        self.assertEqual(page.number, 3)
+        self.assertEqual(
+            [post.pk for post in page],
+            list(posts.values_list('pk', flat=True)[10:13])
+        )
+        self.assertFalse(page.has_next())
@@ -3,7 +3,9 @@ from http import HTTPStatus
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Follow, Group, Post
@@ -220,12 +222,62 @@ class CacheIndexTest(TestCase):
 
     def test_cache_index(self):
         response = self.authorized_client.get(self.url_index)
-        self.post.delete()
+        # update() не отправляет сигналы: фрагмент остается в кэше.
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
         response_cache = self.authorized_client.get(self.url_index)
         self.assertEqual(response.content, response_cache.content)
         cache.clear()
         response_clear = self.authorized_client.get(self.url_index)
-        self.assertNotEqual(response_clear.content, response)
+        self.assertNotEqual(response_clear.content, response.content)
+
+    def test_cache_invalidated_on_write(self):
+        """Сохранение и удаление поста сбрасывают кэш лент."""
+        urls = (
+            self.url_index,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Отредактированный пост'
+        self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Отредактированный пост')
+
+        self.post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotContains(response, 'Отредактированный пост')
+
+    def test_cache_follows_author_names(self):
+        """Смена имени автора сбрасывает ленты, регистрация и вход -
+        нет."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.authorized_client.get(url)['ETag']
+        User.objects.create_user(username='new_user')
+        self.authorized_client.force_login(self.user)
+        self.assertEqual(self.authorized_client.get(url)['ETag'], etag)
+
+        self.user.first_name = 'Лев'
+        self.user.save()
+
+        self.assertContains(self.authorized_client.get(self.url_index), 'Лев')
+
+    def test_cache_varies_by_page(self):
+        """Каждая страница ленты кэшируется отдельно."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {num}', author=self.user) for num in range(10)
+        )
+        cache.clear()
+        first = self.authorized_client.get(self.url_index)
+        second = self.authorized_client.get(
+            self.url_index, {'cursor': first.context['page_obj'].next_cursor}
+        )
+        self.assertContains(second, 'Тестовый пост')
+        self.assertNotEqual(first.content, second.content)
 
 
 class FollowTest(TestCase):
@@ -281,6 +333,12 @@ class FollowTest(TestCase):
         self.assertEqual(Follow.objects.count(), count)
         self.assertRedirects(response_unfollow, '/profile/test_user/')
 
+    def test_unfollow_without_follow(self):
+        """Отписка без подписки просто возвращает в профиль."""
+        response = self.authorized_client.get(FollowTest.profile_unfollow)
+
+        self.assertRedirects(response, '/profile/test_user/')
+
     def test_index_follow(self):
         response_follow = self.authorized_client.get(
             FollowTest.profile_follow, follow=True
@@ -297,3 +355,67 @@ class FollowTest(TestCase):
         self.assertNotEqual(response.content, resoponse_3.content)
         self.assertEqual(response_2.content, resoponse_4.content)
         self.assertEqual(response_follow.status_code, HTTPStatus.OK)
+
+
+class FeedQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test_title',
+            description='Test_description',
+            slug='Group',
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author_0'}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueryCountTest.reader)
+
+    def add_posts(self, count):
+        for num in range(count):
+            author, _ = User.objects.get_or_create(username=f'author_{num}')
+            Follow.objects.get_or_create(
+                user=FeedQueryCountTest.reader, author=author
+            )
+            Post.objects.create(
+                text=f'Пост {num}', author=author,
+                group=FeedQueryCountTest.group
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        self.add_posts(1)
+        small = [self.count_queries(url) for url in FeedQueryCountTest.urls]
+        self.add_posts(12)
+        full = [self.count_queries(url) for url in FeedQueryCountTest.urls]
+
+        self.assertEqual(small, full)
+
+    def test_profile_query_count(self):
+        """Число запросов профиля не растет с числом постов автора."""
+        author = User.objects.create_user(username='author')
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        counts = []
+        for count in (1, 12):
+            for num in range(count - Post.objects.count()):
+                Post.objects.create(
+                    text=f'Пост {num}', author=author,
+                    group=FeedQueryCountTest.group
+                )
+            counts.append(self.count_queries(url))
+
+        self.assertEqual(counts[0], counts[1])
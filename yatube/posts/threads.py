@@ -0,0 +1,97 @@
+"""Ветки комментариев на материализованном пути.
+
+Путь комментария - id предков и его собственный, каждый дополнен
+нулями до Comment.path_width и отделен точкой. Строковый порядок
+путей совпадает с обходом дерева, поэтому ветка целиком - один
+диапазон индекса (post, path): от пути корня до пути с точкой,
+замененной на следующий символ «/».
+"""
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+
+from .models import Comment
+from .utils import CursorPaginator, comment_orderings, number
+
+# Сколько ответов на все корни страницы читается одним запросом.
+replies_limit = 50
+comment_fields = ('id', 'post', 'parent', 'path', 'reply_count', 'text',
+                  'created', 'author__username')
+
+
+def root_path():
+    """Путь корня для UPDATE: собственный id, дополненный нулями."""
+    return LPad(Cast('id', CharField()), Comment.path_width, Value('0'))
+
+
+def _comments(post_id):
+    return Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only(*comment_fields)
+
+
+def reply_parent(post_id, parent_id):
+    """Комментарий, к которому прикрепить ответ, или None.
+
+    Ответ глубже Comment.max_depth прикрепляется к родителю
+    комментария, то есть становится ему соседом.
+    """
+    if parent_id in (None, ''):
+        return None
+    try:
+        parent = Comment.objects.only('id', 'path', 'parent').get(
+            pk=parent_id, post_id=post_id
+        )
+    except (Comment.DoesNotExist, TypeError, ValueError):
+        return None
+    if parent.depth >= Comment.max_depth:
+        return Comment.objects.only('id', 'path').get(pk=parent.parent_id)
+    return parent
+
+
+def thread_page(post_id, order, cursor, per_page=number):
+    """Страница корней по курсору, у каждого корня - загруженная
+    часть ветки в thread и курсор more_after, если ветка не вся."""
+    roots = _comments(post_id).filter(parent=None)
+    page = CursorPaginator(roots, per_page, comment_orderings[order]).page(
+        cursor
+    )
+    attach_replies(post_id, page.object_list)
+    return page
+
+
+def attach_replies(post_id, roots, limit=replies_limit):
+    """Ответы на все корни одним запросом по диапазону путей."""
+    branches = {root.path: root for root in roots}
+    for root in roots:
+        root.thread = []
+    paths = [root.path for root in roots if root.reply_count]
+    if paths:
+        replies = _comments(post_id).filter(
+            parent__isnull=False,
+            path__gt=min(paths),
+            path__lt=f'{max(paths)}/',
+        ).order_by('path')[:limit]
+        for reply in replies:
+            root = branches.get(reply.path[:Comment.path_width])
+            if root is not None:
+                root.thread.append(reply)
+    for root in roots:
+        root.more_after = None
+        if len(root.thread) < root.reply_count:
+            root.more_after = (
+                root.thread[-1].path if root.thread else root.path
+            )
+
+
+def replies_after(comment, after, limit=replies_limit):
+    """Следующие ответы ветки comment после пути after и путь для
+    следующей порции или None."""
+    if not after.startswith(comment.path):
+        after = comment.path
+    replies = list(
+        _comments(comment.post_id).filter(
+            path__gt=after, path__lt=f'{comment.path}/'
+        ).order_by('path')[:limit + 1]
+    )
+    more_after = replies[limit - 1].path if len(replies) > limit else None
+    return replies[:limit], more_after
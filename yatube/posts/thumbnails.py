@@ -0,0 +1,460 @@
+import base64
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from PIL import Image, ImageOps
+from sorl.thumbnail.images import ImageFile
+
+from . import feed_cache, object_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+pending_timeout = 300
+ready_timeout = 60 * 60 * 24
+placeholder_size = 16
+sanitize_options = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+mime_types = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PregeneratingBackend(ThumbnailBackend):
+    """Бэкенд sorl, разделяющий поиск миниатюры и ее создание.
+
+    Имя файла и ключ в kvstore считаются так же, как в get_thumbnail,
+    поэтому готовые миниатюры видны и обычному тегу {% thumbnail %}.
+    """
+
+    def resolve(self, name, geometry, options):
+        source = ImageFile(name)
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        thumbnail = ImageFile(
+            self._get_thumbnail_filename(source, geometry, options),
+            default.storage
+        )
+        return source, thumbnail, options
+
+    def cached(self, name, geometry, options):
+        """Готовая миниатюра из kvstore или None, без генерации."""
+        _, thumbnail, _ = self.resolve(name, geometry, options)
+        return default.kvstore.get(thumbnail)
+
+    def render(self, name, geometries):
+        """Создает файлы миниатюр, декодируя оригинал один раз.
+
+        Не обращается ни к базе, ни к kvstore, поэтому годится для
+        дочернего процесса. Возвращает размер оригинала, список
+        (имя, размер) миниатюр и поля describe для поста.
+        """
+        source = ImageFile(name)
+        image = default.engine.get_image(source)
+        try:
+            rendered = []
+            for geometry, options in geometries:
+                _, thumbnail, options = self.resolve(name, geometry, options)
+                if not thumbnail.exists():
+                    options['image_info'] = default.engine.get_image_info(
+                        image
+                    )
+                    self._create_thumbnail(
+                        image, geometry, options, thumbnail
+                    )
+                rendered.append((thumbnail.name, thumbnail.size))
+            return (
+                default.engine.get_image_size(image), rendered, describe(image)
+            )
+        finally:
+            default.engine.cleanup(image)
+
+    def register(self, name, size, rendered, meta=None):
+        """Записывает созданные миниатюры в kvstore, а размеры и
+        превью - в посты с этой картинкой."""
+        if meta:
+            posts = Post.objects.filter(image=name)
+            pks = list(posts.values_list('pk', flat=True))
+            posts.update(**meta)
+            object_cache.forget(Post, *pks)
+        source = ImageFile(name)
+        source.set_size(size)
+        default.kvstore.get_or_set(source)
+        for thumbnail_name, thumbnail_size in rendered:
+            thumbnail = ImageFile(thumbnail_name, default.storage)
+            thumbnail.set_size(thumbnail_size)
+            default.kvstore.set(thumbnail, source)
+
+
+def sanitize(upload):
+    """Очищенная копия загрузки или None, если чистить нечего.
+
+    Убирает EXIF с применением поворота к пикселям и перекодирует
+    JPEG в progressive. GIF не трогается, чтобы не потерять анимацию.
+    Вызывается до сохранения: имя файла - хэш содержимого, и под ним
+    не должен оказаться оригинал с метаданными.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        image_format = image.format
+        if image_format not in sanitize_options:
+            return None
+        if 'exif' not in image.info and (
+            image_format != 'JPEG' or image.info.get('progressive')
+        ):
+            return None
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        output = BytesIO()
+        options = dict(sanitize_options[image_format])
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        image.save(output, image_format, **options)
+    finally:
+        upload.seek(0)
+    return ContentFile(output.getvalue(), name=upload.name)
+
+
+def describe(image):
+    """Размеры, размытое превью и основной цвет картинки Pillow."""
+    small = image.convert('RGB')
+    small.thumbnail((placeholder_size, placeholder_size))
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    _, color = max(small.quantize(colors=4).convert('RGB').getcolors())
+    return {
+        'image_width': image.width,
+        'image_height': image.height,
+        'image_placeholder': 'data:image/jpeg;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode(),
+        'image_color': '#{:02x}{:02x}{:02x}'.format(*color),
+    }
+
+
+def describe_file(name):
+    """describe для файла из хранилища; None, если файл не читается."""
+    try:
+        with default.storage.open(name) as source:
+            image = Image.open(source)
+            size = image.size
+            # JPEG декодируется сразу в уменьшенном виде.
+            image.draft('RGB', (placeholder_size * 4, placeholder_size * 4))
+            meta = describe(image)
+            meta['image_width'], meta['image_height'] = size
+    except Exception:
+        logger.exception('Не удалось прочитать картинку %s', name)
+        return None
+    return meta
+
+
+backend = PregeneratingBackend()
+
+
+def _pending_key(name):
+    return f'thumbnails:pending:{name}'
+
+
+def _ready_key(name):
+    return f'thumbnails:ready:{name}'
+
+
+def _render(name, geometries):
+    return backend.render(name, geometries)
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    # Дочерние процессы держат копию настроек на момент запуска.
+    global _executor
+    if setting in ('MEDIA_ROOT', 'POST_THUMBNAIL_WORKERS'):
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _finish(name, scopes, future):
+    # Выполняется в служебном потоке пула, поэтому только кэш: в
+    # kvstore результат записывает первый запрос, которому он нужен.
+    try:
+        rendered = future.result()
+    except Exception:
+        # Отметка остается до истечения pending_timeout, чтобы битая
+        # картинка не ставилась в очередь на каждом запросе.
+        logger.exception('Не удалось подготовить миниатюры для %s', name)
+        return
+    cache.set(_ready_key(name), rendered, ready_timeout)
+    cache.delete(_pending_key(name))
+    feed_cache.bump(*scopes)
+
+
+def variants(rendition):
+    """Варианты рендишена: (формат, ширина, геометрия, опции sorl)."""
+    spec = settings.POST_IMAGE_RENDITIONS[rendition]
+    ratio_width, ratio_height = spec['ratio']
+    for image_format in spec['formats']:
+        for width in spec['widths']:
+            height = round(width * ratio_height / ratio_width)
+            options = dict(spec['options'], format=image_format)
+            yield image_format, width, f'{width}x{height}', options
+
+
+def geometries():
+    """Все геометрии, которые готовятся заранее для каждой картинки."""
+    return [
+        (geometry, options)
+        for rendition in settings.POST_IMAGE_RENDITIONS
+        for _, _, geometry, options in variants(rendition)
+    ]
+
+
+def schedule(post):
+    """Ставит генерацию всех рендишенов для картинки поста.
+
+    Повторная постановка той же картинки, пока она в работе,
+    игнорируется. При POST_THUMBNAIL_WORKERS = 0 миниатюры
+    создаются сразу в текущем процессе.
+    """
+    name = post.image.name
+    if not name or _reuse(post):
+        return
+    if not cache.add(_pending_key(name), True, pending_timeout):
+        return
+    scopes = feed_cache.post_scopes(post.author_id, post.group_id)
+    if not settings.POST_THUMBNAIL_WORKERS:
+        try:
+            rendered = _render(name, geometries())
+            backend.register(name, *rendered)
+            _apply(post, rendered[2])
+        except Exception:
+            logger.exception('Не удалось подготовить миниатюры для %s', name)
+            return
+        cache.delete(_pending_key(name))
+        feed_cache.bump(*scopes)
+        return
+    _pool().submit(_render, name, geometries()).add_done_callback(
+        partial(_finish, name, scopes)
+    )
+
+
+def _reuse(post):
+    """Берет готовое у другого поста с тем же файлом картинки.
+
+    Одинаковые загрузки хранятся одним файлом, поэтому если у файла
+    уже есть все миниатюры, достаточно скопировать метаданные.
+    """
+    name = post.image.name
+    meta = Post.objects.filter(
+        image=name, image_width__isnull=False
+    ).exclude(pk=post.pk).values(*Post.image_meta_fields).first()
+    if meta is None:
+        return False
+    wanted = [
+        backend.resolve(name, geometry, options)[1]
+        for geometry, options in geometries()
+    ]
+    if not all(lookup_many(wanted)):
+        return False
+    Post.objects.filter(pk=post.pk).update(**meta)
+    object_cache.forget(Post, post.pk)
+    _apply(post, meta)
+    return True
+
+
+def _apply(post, meta):
+    for field, value in meta.items():
+        setattr(post, field, value)
+
+
+def _on_miss(post):
+    """Регистрирует миниатюры, готовые в пуле, или ставит генерацию.
+
+    Возвращает True, если миниатюры стоит перечитать.
+    """
+    name = post.image.name
+    rendered = cache.get(_ready_key(name))
+    if rendered is not None:
+        backend.register(name, *rendered)
+        cache.delete(_ready_key(name))
+        _apply(post, rendered[2])
+        post.__dict__.pop('_thumbnails', None)
+        return True
+    schedule(post)
+    post.__dict__.pop('_thumbnails', None)
+    return not settings.POST_THUMBNAIL_WORKERS
+
+
+def lookup_many(image_files):
+    """Записи kvstore для списка картинок, None для отсутствующих."""
+    get_many = getattr(default.kvstore, 'get_many', None)
+    if get_many is None:
+        return [default.kvstore.get(image_file) for image_file in image_files]
+    return get_many(image_files)
+
+
+def _memo_key(geometry, options):
+    return geometry, tuple(sorted(options.items()))
+
+
+def prefetch(posts, wanted):
+    """Находит миниатюры всех постов страницы одним обращением к kvstore.
+
+    wanted - список пар (геометрия, опции). Результат запоминается
+    на постах и читается ready_thumbnail и picture.
+    """
+    pairs = [
+        (post, geometry, options)
+        for post in posts if post.image
+        for geometry, options in wanted
+    ]
+    if not pairs:
+        return
+    thumbnails = [
+        backend.resolve(post.image.name, geometry, options)[1]
+        for post, geometry, options in pairs
+    ]
+    found = lookup_many(thumbnails)
+    for (post, geometry, options), thumbnail in zip(pairs, found):
+        memo = post.__dict__.setdefault('_thumbnails', {})
+        memo[_memo_key(geometry, options)] = thumbnail
+
+
+def prefetch_rendition(posts, rendition):
+    prefetch(posts, [
+        (geometry, options)
+        for _, _, geometry, options in variants(rendition)
+    ])
+
+
+def forget(name):
+    """Удаляет из kvstore картинку и ее миниатюры вместе с файлами."""
+    if name:
+        default.kvstore.delete(ImageFile(name))
+
+
+def _lookup(post, geometry, options):
+    prefetched = getattr(post, '_thumbnails', {})
+    key = _memo_key(geometry, options)
+    if key in prefetched:
+        return prefetched[key]
+    return backend.cached(post.image.name, geometry, options)
+
+
+def ready_thumbnail(post, geometry, **options):
+    """Миниатюра картинки поста, если она уже готова.
+
+    Иначе ставит генерацию и возвращает None, чтобы шаблон показал
+    заглушку вместо обработки картинки внутри запроса.
+    """
+    name = post.image.name
+    if not name:
+        return None
+    try:
+        thumbnail = _lookup(post, geometry, options)
+        if thumbnail is None and _on_miss(post):
+            thumbnail = backend.cached(name, geometry, options)
+    except Exception:
+        logger.exception('Не удалось получить миниатюру для %s', name)
+        return None
+    return thumbnail
+
+
+def _srcset(found):
+    return ', '.join(
+        f'{thumbnail.url} {width}w' for width, thumbnail in found
+    )
+
+
+def _collect(post, rendition):
+    found = {
+        image_format: []
+        for image_format in settings.POST_IMAGE_RENDITIONS[rendition][
+            'formats'
+        ]
+    }
+    missing = False
+    for image_format, width, geometry, options in variants(rendition):
+        thumbnail = _lookup(post, geometry, options)
+        if thumbnail is None:
+            missing = True
+        else:
+            found[image_format].append((width, thumbnail))
+    return found, missing
+
+
+def picture(post, rendition):
+    """Данные для <picture> с srcset по готовым вариантам рендишена.
+
+    Недостающие варианты ставятся в очередь. Пока нет ни одного
+    варианта запасного формата, возвращается None и шаблон выводит
+    заглушку.
+    """
+    if not post.image.name:
+        return None
+    spec = settings.POST_IMAGE_RENDITIONS[rendition]
+    try:
+        found, missing = _collect(post, rendition)
+        if missing and _on_miss(post):
+            found, _ = _collect(post, rendition)
+    except Exception:
+        logger.exception(
+            'Не удалось получить миниатюры для %s', post.image.name
+        )
+        return None
+    fallback = found.pop(spec['formats'][-1])
+    if not fallback:
+        return None
+    width, thumbnail = min(
+        fallback, key=lambda item: abs(item[0] - spec['ratio'][0])
+    )
+    return {
+        'sources': [
+            {'type': mime_types[image_format], 'srcset': _srcset(ready)}
+            for image_format, ready in found.items() if ready
+        ],
+        'src': thumbnail.url,
+        'srcset': _srcset(fallback),
+        'sizes': spec['sizes'],
+        'width': thumbnail.width,
+        'height': thumbnail.height,
+    }
@@ -0,0 +1,492 @@
+"""Потоковые выгрузка и загрузка постов, комментариев и подписок.
+
+Формат - JSONL: по записи на строку, поле type задает вид записи.
+Записи идут в порядке group, user, post, comment, follow, чтобы
+при загрузке автор, группа и пост были известны раньше ссылок на них.
+Пользователи и группы связываются по username и slug, посты - по id
+из файла через словарь старых id в новые. Файлы с расширением .gz
+и .zst сжимаются; для .zst нужен пакет zstandard.
+"""
+import contextlib
+import gzip
+import itertools
+import json
+import os
+import sys
+import zlib
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import feed_cache, search
+from .counters import reconcile_counters
+from .feeds import rebuild_timelines
+from .models import Comment, Follow, Group, Post
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+User = get_user_model()
+
+batch_size = 1000
+record_types = ('group', 'user', 'post', 'comment', 'follow')
+# Хэш пароля и права выгружаются и загружаются только по явному
+# флагу: файл выгрузки не защищен, а права из него нельзя принимать
+# на веру.
+user_fields = ('username', 'first_name', 'last_name', 'email', 'is_active')
+credential_fields = ('password', 'is_staff', 'is_superuser')
+credential_defaults = {'password': '!', 'is_staff': False,
+                       'is_superuser': False}
+# Поля, которые меняются при загрузке или выгружаются не всегда;
+# в контрольную сумму они не входят.
+local_fields = {
+    'user': credential_fields,
+    'post': ('id',),
+    'comment': ('id', 'post', 'parent'),
+}
+
+
+class TransferError(Exception):
+    pass
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextlib.contextmanager
+def manual_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def peak_memory():
+    """Пик потребления памяти процессом в мегабайтах или None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты.
+    return peak / 1024 ** (2 if sys.platform == 'darwin' else 1)
+
+
+def report(total, elapsed):
+    """Строка о скорости обработки и памяти для вывода команд."""
+    line = (
+        f'{total} записей за {elapsed:.1f} с, '
+        f'{total / max(elapsed, 1e-9):.0f} записей/с'
+    )
+    memory = peak_memory()
+    if memory is not None:
+        line += f', пик памяти {memory:.0f} МБ'
+    return line
+
+
+def open_stream(path, mode):
+    """Текстовый поток файла; сжатие выбирается по расширению."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise TransferError('Для файлов .zst установите zstandard')
+        return zstandard.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def records(batch=batch_size, credentials=False):
+    """Все записи базы в порядке загрузки, без чтения таблиц целиком.
+
+    С credentials у пользователей выгружаются хэш пароля и права.
+    """
+    fields = user_fields + (credential_fields if credentials else ())
+    groups = Group.objects.order_by('pk').values_list(
+        'slug', 'title', 'description'
+    )
+    for slug, title, description in groups.iterator(chunk_size=batch):
+        yield {'type': 'group', 'slug': slug, 'title': title,
+               'description': description}
+    users = User.objects.order_by('pk').values_list(
+        'date_joined', *fields
+    )
+    for date_joined, *values in users.iterator(chunk_size=batch):
+        yield {'type': 'user', 'date_joined': _date(date_joined),
+               **dict(zip(fields, values))}
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, author, group, text, pub_date, image in posts.iterator(
+        chunk_size=batch
+    ):
+        yield {'type': 'post', 'id': pk, 'author': author, 'group': group,
+               'text': text, 'pub_date': _date(pub_date), 'image': image}
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'parent_id', 'author__username', 'text', 'created'
+    )
+    for pk, post_id, parent_id, author, text, created in comments.iterator(
+        chunk_size=batch
+    ):
+        yield {'type': 'comment', 'id': pk, 'post': post_id,
+               'parent': parent_id, 'author': author, 'text': text,
+               'created': _date(created)}
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'
+    )
+    for user, author in follows.iterator(chunk_size=batch):
+        yield {'type': 'follow', 'user': user, 'author': author}
+
+
+def export(path, batch=batch_size, credentials=False):
+    """Пишет записи базы в файл; возвращает их число по видам."""
+    counts = Counter()
+    with open_stream(path, 'wt') as stream:
+        for record in records(batch, credentials):
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            counts[record['type']] += 1
+    return counts
+
+
+def read(path):
+    """Пары (номер строки, запись) из файла."""
+    with open_stream(path, 'rt') as stream:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise TransferError(f'Строка {number}: не JSON')
+            if record.get('type') not in record_types:
+                raise TransferError(f'Строка {number}: неизвестный тип')
+            yield number, record
+
+
+def summary(records):
+    """Число записей и контрольная сумма по каждому виду.
+
+    Сумма не зависит от порядка записей и от id, которые база
+    выдает заново при загрузке.
+    """
+    result = {kind: {'count': 0, 'checksum': 0} for kind in record_types}
+    for record in records:
+        kind = record['type']
+        stable = {
+            key: value for key, value in record.items()
+            if key not in local_fields.get(kind, ())
+        }
+        row = result[kind]
+        row['count'] += 1
+        row['checksum'] = (row['checksum'] + zlib.crc32(
+            json.dumps(stable, sort_keys=True, ensure_ascii=False).encode()
+        )) % 2 ** 64
+    return result
+
+
+def verify(path, batch=batch_size):
+    """Расхождения файла и базы: {вид: (файл, база)}."""
+    in_file = summary(record for _, record in read(path))
+    in_database = summary(records(batch))
+    return {
+        kind: (in_file[kind], in_database[kind])
+        for kind in record_types if in_file[kind] != in_database[kind]
+    }
+
+
+def _write_json(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stream:
+        json.dump(data, stream)
+    os.replace(temporary, path)
+
+
+def _committed(new_ids):
+    """Есть ли в базе строки пачки; пачки без новых id загружаются
+    повторно без дублей."""
+    if not new_ids:
+        return False
+    kind, _, new = new_ids[0]
+    if kind == 'post':
+        return Post.objects.filter(pk=new).exists()
+    return Comment.objects.filter(path=new).exists()
+
+
+class Checkpoint:
+    """Номер последней загруженной строки и новые id постов и
+    комментариев.
+
+    Номер перезаписывается целиком после каждой пачки, соответствия id
+    дописываются в соседний файл, так что сохранение не растет вместе
+    с числом загруженных записей. Для комментария вместо id хранится
+    путь в ветке: он нужен ответам, а id - его последний сегмент.
+
+    Файл и транзакция не коммитятся вместе, поэтому перед коммитом
+    пачка записывается в отметку pending. Если процесс упал между
+    коммитом и save, при продолжении отметка сверяется с базой, и
+    уже загруженная пачка не вставляется второй раз.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids_path = f'{path}.ids'
+        self.pending_path = f'{path}.pending'
+
+    def load(self):
+        self._settle()
+        ids = {'post': {}, 'comment': {}}
+        if not os.path.exists(self.path):
+            return 0, ids
+        with open(self.path, encoding='utf-8') as stream:
+            line = json.load(stream)['line']
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, encoding='utf-8') as stream:
+                for row in stream:
+                    kind, old, new = row.split()
+                    ids[kind][int(old)] = int(new) if kind == 'post' else new
+        return line, ids
+
+    def prepare(self, line, new_ids):
+        """Отметка о пачке внутри ее транзакции, до коммита."""
+        _write_json(self.pending_path, {'line': line, 'ids': new_ids})
+
+    def save(self, line, new_ids):
+        if new_ids:
+            with open(self.ids_path, 'a', encoding='utf-8') as stream:
+                stream.writelines(
+                    f'{kind} {old} {new}\n' for kind, old, new in new_ids
+                )
+        _write_json(self.path, {'line': line})
+        if os.path.exists(self.pending_path):
+            os.remove(self.pending_path)
+
+    def _settle(self):
+        if not os.path.exists(self.pending_path):
+            return
+        with open(self.pending_path, encoding='utf-8') as stream:
+            pending = json.load(stream)
+        if _committed(pending['ids']):
+            self.save(pending['line'], pending['ids'])
+        else:
+            os.remove(self.pending_path)
+
+    def remove(self):
+        for path in (self.path, self.ids_path, self.pending_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class Importer:
+    """Загружает записи пачками через bulk_create.
+
+    Сигналы при этом не срабатывают, поэтому после загрузки
+    ленты, счетчики и поисковый индекс пересобираются целиком.
+    """
+
+    def __init__(self, batch=batch_size, checkpoint=None,
+                 credentials=False):
+        self.batch = batch
+        self.checkpoint = checkpoint
+        self.credentials = credentials
+        self.users = {}
+        self.groups = {}
+        self.ids = {'post': {}, 'comment': {}}
+        self.new_ids = []
+        self.counts = Counter()
+
+    def run(self, path):
+        start = 0
+        if self.checkpoint is not None:
+            start, self.ids = self.checkpoint.load()
+        pending = []
+        line = start
+        for number, record in read(path):
+            if number <= start:
+                continue
+            if pending and (
+                record['type'] != pending[0]['type']
+                or len(pending) >= self.batch
+            ):
+                self.flush(pending, line)
+                pending = []
+            pending.append(record)
+            line = number
+        if pending:
+            self.flush(pending, line)
+        self.rebuild()
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+        return self.counts
+
+    def flush(self, pending, line):
+        kind = pending[0]['type']
+        with transaction.atomic():
+            created = getattr(self, f'load_{kind}s')(pending)
+            if self.checkpoint is not None:
+                self.checkpoint.prepare(line, self.new_ids)
+        self.counts[kind] += created
+        self.counts['skipped'] += len(pending) - created
+        if self.checkpoint is not None:
+            self.checkpoint.save(line, self.new_ids)
+        self.new_ids = []
+
+    def resolve(self, model, field, known, keys):
+        """Дочитывает в словарь known id по значениям поля field."""
+        missing = {key for key in keys if key and key not in known}
+        if missing:
+            known.update(
+                model.objects.filter(**{f'{field}__in': missing})
+                .values_list(field, 'pk')
+            )
+
+    def load_groups(self, pending):
+        Group.objects.bulk_create((
+            Group(slug=record['slug'], title=record['title'],
+                  description=record['description'])
+            for record in pending
+        ), ignore_conflicts=True)
+        self.resolve(
+            Group, 'slug', self.groups, [record['slug'] for record in pending]
+        )
+        return len(pending)
+
+    def load_users(self, pending):
+        # Без credentials вход по паролю закрыт, а прав нет, что бы
+        # ни было в файле.
+        defaults = {'is_active': True}
+        User.objects.bulk_create((
+            User(**{
+                field: record.get(field, defaults.get(field))
+                for field in user_fields
+            }, **{
+                field: record.get(field, default)
+                if self.credentials else default
+                for field, default in credential_defaults.items()
+            }, date_joined=(
+                parse_datetime(record['date_joined'])
+                if record.get('date_joined') else timezone.now()
+            ))
+            for record in pending
+        ), ignore_conflicts=True)
+        self.resolve(
+            User, 'username', self.users,
+            [record['username'] for record in pending]
+        )
+        return len(pending)
+
+    def insert(self, model, objects, date_field):
+        """bulk_create с заданными датами; проставляет объектам pk."""
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        with manual_dates(model._meta.get_field(date_field)):
+            model.objects.bulk_create(objects)
+        if objects and objects[0].pk is None:
+            # SQLite не возвращает pk из bulk_create: новые строки
+            # читаются по диапазону после последней существующей.
+            pks = model.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', flat=True)
+            for obj, pk in zip(objects, pks):
+                obj.pk = pk
+
+    def load_posts(self, pending):
+        self.resolve(
+            User, 'username', self.users,
+            [record['author'] for record in pending]
+        )
+        self.resolve(
+            Group, 'slug', self.groups,
+            [record['group'] for record in pending]
+        )
+        pending = [
+            record for record in pending if record['author'] in self.users
+        ]
+        posts = [
+            Post(author_id=self.users[record['author']],
+                 group_id=self.groups.get(record['group']),
+                 text=record['text'],
+                 pub_date=parse_datetime(record['pub_date']),
+                 image=record['image'])
+            for record in pending
+        ]
+        self.insert(Post, posts, 'pub_date')
+        for record, post in zip(pending, posts):
+            self.ids['post'][record['id']] = post.pk
+            self.new_ids.append(('post', record['id'], post.pk))
+        return len(posts)
+
+    def load_comments(self, pending):
+        """Комментарии вставляются без ветки: родитель может оказаться
+        в той же пачке. Родитель и путь ставятся вторым запросом,
+        когда известны новые id."""
+        self.resolve(
+            User, 'username', self.users,
+            [record['author'] for record in pending]
+        )
+        posts = self.ids['post']
+        pending = [
+            record for record in pending
+            if record['post'] in posts and record['author'] in self.users
+        ]
+        comments = [
+            Comment(post_id=posts[record['post']],
+                    author_id=self.users[record['author']],
+                    text=record['text'],
+                    created=parse_datetime(record['created']))
+            for record in pending
+        ]
+        self.insert(Comment, comments, 'created')
+        paths = self.ids['comment']
+        for record, comment in zip(pending, comments):
+            comment.path = f'{comment.pk:0{Comment.path_width}d}'
+            parent_path = paths.get(record.get('parent'))
+            if parent_path is not None:
+                comment.parent_id = int(parent_path.rpartition('.')[2])
+                comment.path = f'{parent_path}.{comment.path}'
+            paths[record['id']] = comment.path
+            self.new_ids.append(('comment', record['id'], comment.path))
+        Comment.objects.bulk_update(comments, ['parent', 'path'])
+        return len(comments)
+
+    def load_follows(self, pending):
+        self.resolve(
+            User, 'username', self.users,
+            [name for record in pending
+             for name in (record['user'], record['author'])]
+        )
+        follows = [
+            Follow(user_id=self.users[record['user']],
+                   author_id=self.users[record['author']])
+            for record in pending
+            if record['user'] in self.users and record['author'] in self.users
+        ]
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows)
+
+    def rebuild(self):
+        rebuild_timelines(self.batch)
+        reconcile_counters(self.batch)
+        search.rebuild(self.batch)
+        feed_cache.bump('index', 'authors')
@@ -0,0 +1,107 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler
+)
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл кусками, не держа ее в памяти.
+
+    Как только файл переходит POST_IMAGE_MAX_BYTES, разбор запроса
+    останавливается, не дочитывая тело. Вместо файла в oversized
+    остается пустая заготовка с прочитанным размером: по нему форма
+    сообщит, что файл слишком большой.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.oversized = {}
+
+    def receive_data_chunk(self, raw_data, start):
+        size = start + len(raw_data)
+        if size > settings.POST_IMAGE_MAX_BYTES:
+            self.oversized[self.field_name] = UploadedFile(
+                name=self.file_name, content_type=self.content_type,
+                size=size,
+            )
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def limited_uploads(view):
+    """Разбирает загрузки view через LimitedUploadHandler.
+
+    Обработчик нужно поставить до того, как CsrfViewMiddleware
+    прочитает request.POST, поэтому проверка CSRF переносится
+    внутрь. Остановленные загрузки возвращаются в request.FILES
+    заготовками.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        handler = LimitedUploadHandler(request)
+        request.upload_handlers = [handler]
+        if request.method == 'POST':
+            # Обращение к FILES разбирает тело запроса.
+            request.FILES.update(handler.oversized)
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def check_size(upload):
+    limit = settings.POST_IMAGE_MAX_BYTES
+    if upload.size > limit:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(limit)},
+        )
+
+
+def check_size_first(field):
+    """Ставит проверку размера перед разбором файла полем field:
+    усеченную загрузку Pillow счел бы поврежденной картинкой."""
+    to_python = field.to_python
+
+    def checked(data):
+        if getattr(data, 'size', None) is not None:
+            check_size(data)
+        return to_python(data)
+    field.to_python = checked
+
+
+def check_image(upload):
+    """Валидатор загруженной картинки: размер файла, формат и число
+    пикселей по заголовку, без декодирования."""
+    check_size(upload)
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    finally:
+        upload.seek(0)
+    if image_format not in settings.POST_IMAGE_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image_format},
+        )
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)sx%(height)s слишком большая.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
@@ -1,13 +1,359 @@
-from django.core.paginator import Paginator
+import hashlib
+import heapq
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
 
 number = 10
+feed_ordering = ('-pub_date', '-id')
+comment_orderings = {'old': ('created', 'id'), 'new': ('-created', '-id')}
+CURSOR_SALT = 'posts.utils.cursor'
+# Сколько хранится устаревшее число строк, пока идет пересчет.
+stale_count_timeout = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием «строго после последней записи»
+    и забирает per_page + 1 строк: лишняя строка показывает, есть ли
+    следующая страница. Курсор подписан и не раскрывает значения ключа.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, ordering=feed_ordering):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Известно только, есть ли страница после текущей.
+        return self._num_pages
+
+    def encode(self, obj, forward, page_number):
+        values = [getattr(obj, name) for name in self.fields]
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        return signing.dumps(
+            [values, forward, page_number], salt=CURSOR_SALT, compress=True
+        )
+
+    def decode(self, cursor):
+        try:
+            values, forward, page_number = signing.loads(
+                cursor, salt=CURSOR_SALT
+            )
+            values = [
+                self._to_python(name, value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        return values, bool(forward), int(page_number)
+
+    def _to_python(self, name, value):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field.to_python(value)
+        try:
+            field = self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, forward):
+        lookup = 'lt' if self.descending == forward else 'gt'
+        first, second = self.fields
+        return (
+            Q(**{f'{first}__{lookup}': values[0]})
+            | Q(**{first: values[0], f'{second}__{lookup}': values[1]})
+        )
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _fetch(self, queryset, values, forward):
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[:self.per_page + 1])
+
+    def rows(self, values, forward):
+        return self._fetch(self.object_list, values, forward)
+
+    def page(self, cursor=None):
+        decoded = self.decode(cursor) if cursor else None
+        if decoded is not None:
+            values, forward, page_number = decoded
+            page = self._build_page(
+                self.rows(values, forward), forward, page_number
+            )
+            if page.object_list:
+                return page
+            # Записи вокруг курсора исчезли: начинаем с первой страницы.
+        return self._build_page(self.rows(None, True), True, 0)
+
+    def _build_page(self, rows, forward, page_number):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            page_number += 1
+            self._num_pages = page_number + 1 if has_more else page_number
+        else:
+            rows.reverse()
+            page_number = max(page_number - 1, 2) if has_more else 1
+            self._num_pages = page_number + 1
+        page = Page(rows, page_number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and page.has_next():
+            page.next_cursor = self.encode(rows[-1], True, page_number)
+        if rows and page.has_previous():
+            page.previous_cursor = self.encode(rows[0], False, page_number)
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорный вывод, собранный k-way слиянием нескольких выборок.
+
+    Все выборки должны отдавать одинаковые поля ключа; каждая читается
+    своим запросом с тем же условием поиска, а совпавшие по ключу записи
+    остаются в одном экземпляре.
+    """
+
+    def __init__(self, sources, per_page, ordering=feed_ordering):
+        super().__init__(sources[0], per_page, ordering)
+        self.sources = [source.order_by(*ordering) for source in sources]
+
+    def rows(self, values, forward):
+        merged = heapq.merge(
+            *(self._fetch(source, values, forward) for source in self.sources),
+            key=self._key,
+            reverse=self.descending == forward,
+        )
+        rows = []
+        for obj in merged:
+            if rows and self._key(rows[-1]) == self._key(obj):
+                continue
+            rows.append(obj)
+            if len(rows) > self.per_page:
+                break
+        return rows
+
+    def _key(self, obj):
+        return tuple(getattr(obj, name) for name in self.fields)
+
+
+def page_window(number, num_pages, around=2):
+    """Номера страниц вокруг текущей плюс первая и последняя.
+
+    None отмечает пропуск. Ссылок не больше 2 * around + 5 при любом
+    числе страниц, поэтому навигация не перебирает page_range.
+    """
+    start = max(number - around, 1)
+    end = min(number + around, num_pages)
+    pages = list(range(start, end + 1))
+    # Пропуск ставится, только если прячет больше одной страницы.
+    if start > 3:
+        pages[:0] = [1, None]
+    else:
+        pages[:0] = range(1, start)
+    if end < num_pages - 2:
+        pages += [None, num_pages]
+    else:
+        pages += range(end + 1, num_pages + 1)
+    return pages
+
+
+def estimated_count(queryset):
+    """Число строк выборки без COUNT(*) или None, если оценить нельзя.
+
+    На Postgres это оценка планировщика; на остальных базах оценивается
+    только выборка без условий - по разбросу первичного ключа, который
+    берется из индекса.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if queryset.query.where or not queryset.query.can_filter():
+        return None
+    bounds = queryset.order_by().aggregate(first=Min('pk'), last=Max('pk'))
+    if not isinstance(bounds['last'], int):
+        return 0 if bounds['last'] is None else None
+    return bounds['last'] - bounds['first'] + 1
+
+
+def _count_key(queryset):
+    # Порядок и select_related на число строк не влияют.
+    sql = str(queryset.order_by().values('pk').query)
+    return f'posts:count:{hashlib.md5(sql.encode()).hexdigest()}'
+
+
+def _store_count(queryset, count):
+    key = _count_key(queryset)
+    if count > settings.COUNT_ESTIMATE_THRESHOLD:
+        cache.set(key, (count, time.time()), stale_count_timeout)
+    else:
+        cache.delete(key)
+
+
+def _recount(queryset):
+    try:
+        _store_count(queryset, queryset.count())
+    finally:
+        cache.delete(f'{_count_key(queryset)}:pending')
+
+
+def _recount_in_thread(queryset):
+    try:
+        _recount(queryset)
+    except Exception:
+        logger.exception('Не удалось пересчитать число строк')
+    finally:
+        # У потока пула свое соединение, оно не закроется само.
+        connections[queryset.db].close()
+
+
+def refresh_count(queryset):
+    """Ставит точный COUNT(*) выборки в фон; результат попадет в кэш.
+
+    Повторная постановка, пока пересчет идет, игнорируется. При
+    COUNT_ESTIMATE_WORKERS = 0 считает сразу в текущем запросе.
+    """
+    global _executor
+    pending = f'{_count_key(queryset)}:pending'
+    if not cache.add(pending, True, settings.COUNT_ESTIMATE_TIMEOUT):
+        return
+    if not settings.COUNT_ESTIMATE_WORKERS:
+        _recount(queryset)
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.COUNT_ESTIMATE_WORKERS
+            )
+    _executor.submit(_recount_in_thread, queryset)
+
+
+class EstimatedPaginator(Paginator):
+    """Постраничный вывод без COUNT(*) по большим выборкам.
+
+    До COUNT_ESTIMATE_THRESHOLD строк число считается точно: COUNT
+    по выборке с LIMIT останавливается на пороге. Дальше берется число
+    из кэша, а без него - оценка планировщика; точное число
+    пересчитывается в фоне, когда кэш старше COUNT_ESTIMATE_TIMEOUT.
+    Номер за пределами настоящих данных ведет на последнюю страницу.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        cached = cache.get(_count_key(self.object_list))
+        if cached is not None:
+            count, refreshed = cached
+            if time.time() - refreshed > settings.COUNT_ESTIMATE_TIMEOUT:
+                refresh_count(self.object_list)
+        else:
+            threshold = settings.COUNT_ESTIMATE_THRESHOLD
+            count = self.object_list.order_by()[:threshold + 1].count()
+            if count <= threshold:
+                return count
+            count = max(estimated_count(self.object_list) or 0, count)
+            refresh_count(self.object_list)
+        self.estimated = True
+        return count
+
+    def validate_number(self, number):
+        self.count  # Заполняет estimated.
+        if not self.estimated:
+            return super().validate_number(number)
+        # Номер не сверяется с числом страниц по оценке: есть ли
+        # страница, покажет выборка строк в page().
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы - не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        # Срез не обрезается по оценке: она может оказаться меньше
+        # настоящего числа строк. Лишняя строка показывает, есть ли
+        # данные дальше страницы.
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if len(rows) > self.per_page:
+            if bottom + len(rows) > self.count:
+                # Оценка занижена: страница не последняя.
+                self.count = bottom + len(rows)
+                self.__dict__.pop('num_pages', None)
+                refresh_count(self.object_list)
+            return self._get_page(rows[:self.per_page], number, self)
+        if rows or number == 1:
+            # Неполная страница - последняя: число строк теперь точное.
+            self._settle(bottom + len(rows))
+            return self._get_page(rows, number, self)
+        self._settle(self.object_list.count())
+        return super().page(min(number, self.num_pages))
+
+    def _settle(self, count):
+        self.count = count
+        self.__dict__.pop('num_pages', None)
+        self.estimated = False
+        _store_count(self.object_list, count)
 
 
-def func(request, list_group):
-    paginator = Paginator(list_group, number)
+def func(request, list_group, ordering=feed_ordering, sources=None,
+         count=None):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'page_obj': page_obj
-    }
-    return context['page_obj']
+    if page_number is not None:
+        paginator = EstimatedPaginator(
+            list_group.order_by(*ordering), number
+        )
+        if count is not None:
+            # Готовый счетчик вместо COUNT(*). Он может разойтись
+            # с таблицей, поэтому считается оценкой, и страница
+            # проверяется по строкам.
+            paginator.count = count
+            paginator.estimated = True
+        return paginator.get_page(page_number)
+    if sources:
+        paginator = MergedCursorPaginator(sources, number, ordering)
+    else:
+        paginator = CursorPaginator(list_group, number, ordering)
+    return paginator.page(request.GET.get('cursor'))
@@ -1,65 +1,143 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import feed_cache, object_cache
+from .conditional import (
+    conditional_page, group_validator, post_validator, profile_validator
+)
+from .counters import author_post_count
+from .feeds import follow_feed, follow_posts, timeline_ordering
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import func
+from .models import Comment, Follow, Group, Post, User
+from .search import SearchPaginator
+from .threads import replies_after, reply_parent, thread_page
+from .uploads import limited_uploads
+from .utils import comment_orderings, func, number
 
 date = 10
 
 
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     context = {
-        'page_obj': func(request, post_list)
+        'page_obj': func(request, post_list),
+        'feed_cache': feed_cache.context('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_validator)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
+    group = object_cache.get_or_404(Group, slug=slug)
+    post_list = Post.objects.filter(group=group).for_feed()
     context = {
         'group': group,
-        'page_obj': func(request, post_list),
+        'page_obj': func(request, post_list, count=group.post_count),
+        'feed_cache': feed_cache.context(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_validator)
 def profile(request, username):
-    author = User.objects.get(username=username)
-    post = author.post.select_related('group').all()
-    post_count = post.count()
+    author = object_cache.get_or_404(User, username=username)
+    post = author.post.for_profile()
+    post_count = author_post_count(author)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author
     ).exists()
     context = {
         'author': author,
         'post': post,
-        'page_obj': func(request, post),
+        'page_obj': func(request, post, count=post_count),
         'post_count': post_count,
-        'following': following
+        'following': following,
+        'feed_cache': feed_cache.context(f'profile:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = SearchPaginator(query, number).page(
+            request.GET.get('cursor')
+        )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def _comments(request, post_id):
+    """Страница веток комментариев по курсору и выбранный порядок."""
+    order = request.GET.get('order')
+    if order not in comment_orderings:
+        order = 'old'
+    return {
+        'comments': thread_page(post_id, order, request.GET.get('cursor')),
+        'comment_order': order,
+        'post_id': post_id,
+    }
+
+
+@conditional_page(post_validator)
 def post_detail(request, post_id):
+    post = object_cache.get_or_404(Post, pk=post_id)
+    object_cache.attach([post], 'author', 'group')
+    reply_to = None
+    if request.GET.get('reply'):
+        reply_to = reply_parent(post.pk, request.GET['reply'])
     form = CommentForm()
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments_post.all()
-    posts_count = post.author.post.count()
+    posts_count = author_post_count(post.author_id)
     context = {
         'author': post.author,
         'post': post,
         'posts_count': posts_count,
         'form': form,
-        'comments': comments,
-
+        'reply_to': reply_to,
+        **_comments(request, post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_page(post_validator)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом для подгрузки."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return render(
+        request, 'posts/includes/comment.html', _comments(request, post_id)
+    )
+
+
+@conditional_page(post_validator)
+def comment_replies(request, post_id, comment_id):
+    """Следующая порция ответов ветки фрагментом для подгрузки."""
+    comment = get_object_or_404(
+        Comment.objects.only('id', 'post', 'path'),
+        pk=comment_id, post_id=post_id,
+    )
+    replies, more_after = replies_after(
+        comment, request.GET.get('after', '')
+    )
+    context = {
+        'replies': replies,
+        'comment': comment,
+        'more_after': more_after,
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/replies.html', context)
+
+
 @login_required
+@limited_uploads
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -71,10 +149,15 @@ def post_create(request):
 
 
 @login_required
+@limited_uploads
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = object_cache.get_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id=post_id)
+    if request.method == 'POST':
+        # save() пишет все поля, в том числе счетчики: правится
+        # свежая строка, а не копия из кэша.
+        post.refresh_from_db()
 
     form = PostForm(
         request.POST or None,
@@ -94,21 +177,25 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = Post.objects.get(pk=post_id)
+    post = object_cache.get_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = reply_parent(post.pk, request.POST.get('parent'))
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = follow_posts(request.user)
     context = {
-        'page_obj': func(request, post_list),
+        'page_obj': func(
+            request, post_list, timeline_ordering,
+            sources=follow_feed(request.user)
+        ),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -127,5 +214,5 @@ def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     if user != author:
-        Follow.objects.get(user=user, author=author).delete()
+        Follow.objects.filter(user=user, author=author).delete()
     return redirect('posts:profile', username=username)
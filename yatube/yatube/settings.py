@@ -140,6 +140,67 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кто отдает байты медиа: None - Django через FileResponse,
+# 'x-sendfile' (Apache, lighttpd) или 'x-accel-redirect' (nginx,
+# internal location с префиксом MEDIA_ACCEL_PREFIX) - веб-сервер.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Время кеширования медиа без хэша содержимого в имени.
+MEDIA_MAX_AGE = 60 * 60
+
+# Авторы, у которых подписчиков больше порога, не раскладываются
+# по лентам при публикации, а подмешиваются в ленту при чтении.
+# Обратно в ленты автор раскладывается, только опустившись до
+# FEED_PUSH_THRESHOLD, чтобы не переключаться у самого порога.
+FEED_PULL_THRESHOLD = 10000
+FEED_PUSH_THRESHOLD = 8000
+# Потоков для раскладки постов автора после отписки; 0 - в запросе.
+FEED_PUSH_WORKERS = 1
+
+# Фрагменты лент сбрасываются сигналами при записи, поэтому
+# могут жить долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Строки постов, групп и пользователей в кэше объектов сбрасываются
+# при записи, таймаут ограничивает устаревание при гонках. Отсутствие
+# объекта кэшируется короче.
+OBJECT_CACHE_TIMEOUT = 60 * 5
+OBJECT_CACHE_MISSING_TIMEOUT = 30
+
+# Выборки больше порога не считаются COUNT(*) на каждый запрос:
+# число страниц берется из кэша или оценки планировщика, а точное
+# пересчитывается в фоне, если кэш старше таймаута.
+COUNT_ESTIMATE_THRESHOLD = 10000
+COUNT_ESTIMATE_TIMEOUT = 60 * 5
+# Потоков для фонового пересчета; 0 - считать в запросе.
+COUNT_ESTIMATE_WORKERS = 1
+
+# Рендишены картинки поста для srcset: ширины, пропорции и форматы
+# (последний - запасной для <img>). Все варианты готовятся в фоне
+# сразу после загрузки картинки.
+POST_IMAGE_RENDITIONS = {
+    'feed': {
+        'widths': (480, 960, 1440),
+        'ratio': (960, 339),
+        'formats': ('WEBP', 'JPEG'),
+        'options': {'crop': 'center', 'upscale': True},
+        'sizes': '(max-width: 960px) 100vw, 960px',
+    },
+}
+
+# Ограничения загружаемых картинок. Размер, формат и число пикселей
+# проверяются по заголовку до декодирования.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Число процессов для генерации миниатюр; 0 - генерировать в запросе.
+POST_THUMBNAIL_WORKERS = 2
+
+# Записи о миниатюрах читаются через LRU процесса, затем из кэша и базы.
+THUMBNAIL_KVSTORE = 'posts.kvstore.LRUKVStore'
+POST_THUMBNAIL_LRU_SIZE = 10000
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',